@@ -0,0 +1,93 @@
+"""Seconds per image on the CPU: the default eager float32 path vs. cpu_acceleration settings.
+
+Each configuration loads a fresh pipeline, generates one warm-up image (not
+timed; this is where torch.compile does its work) and then times --images
+generations with a fixed seed. Run from the backend folder:
+
+    python benchmarks/cpu_inference.py --steps 20 --images 3
+    python benchmarks/cpu_inference.py --configs baseline,bf16 --threads 8
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cpu_acceleration import CpuAcceleration, cpu_has_native_bf16  # noqa: E402
+from diffusion_model import MODEL_ID  # noqa: E402
+
+
+CONFIGS = {
+    "baseline": dict(enabled=False),
+    "channels_last": dict(enabled=True, compile="none", bf16="off"),
+    "bf16": dict(enabled=True, compile="none", bf16="on"),
+    "compile": dict(enabled=True, compile="torch_compile", bf16="off"),
+    "compile_bf16": dict(enabled=True, compile="torch_compile", bf16="on"),
+}
+
+
+def time_config(name, options, args):
+    import torch
+    from diffusers import StableDiffusionPipeline
+
+    acceleration = CpuAcceleration(num_threads=args.threads, **options)
+    if not acceleration.enabled:
+        # The current path: torch's own thread count, eager float32
+        torch.set_num_threads(args.threads or torch.get_num_threads())
+    pipeline = StableDiffusionPipeline.from_pretrained(MODEL_ID, torch_dtype=torch.float32).to("cpu")
+    pipeline.set_progress_bar_config(disable=True)
+    acceleration.apply(pipeline)
+
+    def generate(pipeline):
+        generator = torch.Generator(device="cpu").manual_seed(0)
+        with torch.no_grad(), acceleration.inference_context():
+            return pipeline(
+                [args.prompt] * args.batch_size,
+                generator=generator,
+                num_inference_steps=args.steps,
+                width=args.size,
+                height=args.size,
+            ).images
+
+    started = time.perf_counter()
+    generate(pipeline)
+    warmup = time.perf_counter() - started
+
+    timings = []
+    for _ in range(args.images):
+        started = time.perf_counter()
+        generate(pipeline)
+        timings.append((time.perf_counter() - started) / args.batch_size)
+
+    per_image = sorted(timings)[len(timings) // 2]
+    print(f"{name:14s} {per_image:8.2f} s/image (median)   warm-up {warmup:7.1f} s   "
+          f"threads {torch.get_num_threads()}   bf16 {acceleration.use_bf16}")
+
+    del pipeline
+    gc.collect()
+    return per_image
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--configs", default="baseline,channels_last,bf16,compile",
+                        help=f"comma-separated subset of {', '.join(CONFIGS)}")
+    parser.add_argument("--prompt", default="a charcoal sketch of a lighthouse on a cliff")
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--images", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--size", type=int, default=512)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    print(f"{MODEL_ID}, {args.steps} steps, {args.size}x{args.size}, batch {args.batch_size}, "
+          f"native bf16: {cpu_has_native_bf16()}")
+    results = {}
+    for name in args.configs.split(","):
+        results[name] = time_config(name, CONFIGS[name], args)
+
+    if "baseline" in results:
+        for name, per_image in results.items():
+            if name != "baseline":
+                print(f"{name}: {results['baseline'] / per_image:.2f}x the baseline")
@@ -0,0 +1,123 @@
+"""Memory, speed and image quality of the int8-quantized pipeline against float32 on the CPU.
+
+Each mode runs in a fresh process so its memory numbers are its own. Both
+generate the same prompts with the same seeds; the int8 images are compared
+to the float32 ones by PSNR (higher is closer; above ~30 dB differences are
+hard to see). The first int8 run quantizes and fills --cache-dir; run again
+to time a startup that loads the cached weights. Run from the backend folder:
+
+    python benchmarks/int8_quantization.py --steps 20 --images 4
+"""
+import argparse
+import math
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from quantization import QUANTIZED_COMPONENTS, Quantization  # noqa: E402
+from diffusion_model import MODEL_ID  # noqa: E402
+
+
+PROMPTS = (
+    "a charcoal sketch of a lighthouse on a cliff",
+    "a watercolor study of a cat sleeping on a windowsill",
+    "a pencil drawing of a hand holding a teacup",
+    "an ink illustration of a city street in the rain",
+)
+
+
+def _rss_mb(field="VmRSS"):
+    # VmRSS is current resident memory, VmHWM its peak over the process's lifetime
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def module_mb(module):
+    """Weights and buffers held by a module, counting packed int8 Linear weights."""
+    from torch.ao.nn.quantized.dynamic import Linear as DynamicLinear
+
+    total = sum(t.numel() * t.element_size() for t in module.parameters())
+    total += sum(t.numel() * t.element_size() for t in module.buffers())
+    for child in module.modules():
+        if isinstance(child, DynamicLinear):
+            weight, bias = child._weight_bias()
+            total += weight.numel() * weight.element_size()
+            if bias is not None:
+                total += bias.numel() * bias.element_size()
+    return total / (1024 * 1024)
+
+
+def run_mode(mode, args, results):
+    import numpy as np
+    import torch
+    from diffusers import StableDiffusionPipeline
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    started = time.perf_counter()
+    pipeline = StableDiffusionPipeline.from_pretrained(MODEL_ID, torch_dtype=torch.float32).to("cpu")
+    pipeline.set_progress_bar_config(disable=True)
+    Quantization(mode, cache_dir=args.cache_dir).apply(pipeline, MODEL_ID)
+    load_seconds = time.perf_counter() - started
+
+    def generate(prompt, seed):
+        generator = torch.Generator(device="cpu").manual_seed(seed)
+        with torch.no_grad():
+            return pipeline(prompt, generator=generator, num_inference_steps=args.steps).images[0]
+
+    generate(PROMPTS[0], 0)  # warm-up
+
+    images, timings = [], []
+    for i in range(args.images):
+        started = time.perf_counter()
+        image = generate(PROMPTS[i % len(PROMPTS)], i)
+        timings.append(time.perf_counter() - started)
+        images.append(np.asarray(image, dtype=np.float64))
+
+    results.put({
+        "mode": mode,
+        "load_seconds": load_seconds,
+        "seconds_per_image": sorted(timings)[len(timings) // 2],
+        "component_mb": {c: module_mb(getattr(pipeline, c)) for c in QUANTIZED_COMPONENTS},
+        "rss_mb": _rss_mb(),
+        "peak_rss_mb": _rss_mb("VmHWM"),
+        "images": images,
+    })
+
+
+def psnr(a, b):
+    mse = ((a - b) ** 2).mean()
+    return float("inf") if mse == 0 else 10 * math.log10(255 ** 2 / mse)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--images", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--cache-dir", default="quantized_weights")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    runs = {}
+    for mode in ("none", "int8"):
+        results = context.Queue()
+        process = context.Process(target=run_mode, args=(mode, args, results))
+        process.start()
+        runs[mode] = results.get()
+        process.join()
+
+    print(f"{MODEL_ID}, {args.steps} steps, {args.images} images")
+    for mode, run in runs.items():
+        components = ", ".join(f"{c} {mb:.0f} MB" for c, mb in run["component_mb"].items())
+        print(f"{mode:5s} {run['seconds_per_image']:7.2f} s/image (median)   load {run['load_seconds']:6.1f} s   "
+              f"RSS {run['rss_mb']:.0f} MB (peak {run['peak_rss_mb']:.0f} MB)   {components}")
+
+    scores = [psnr(a, b) for a, b in zip(runs["none"]["images"], runs["int8"]["images"])]
+    print("PSNR int8 vs float32: " + ", ".join(f"{s:.1f} dB" for s in scores)
+          + f"   (min {min(scores):.1f} dB)")
@@ -0,0 +1,91 @@
+"""Images per minute for each combination of inference replicas and threads per replica.
+
+For every pair from --replicas x --threads that fits in the CPUs this
+process may use, starts an inference_pool.InferencePool, warms each replica
+up with one image, then keeps every replica busy with single-image jobs
+until --images have been generated. Model loading and warm-up are not
+timed. Run from the backend folder:
+
+    python benchmarks/replica_sweep.py --replicas 1,2,4,8 --threads 2,4,8,16 --steps 20
+"""
+import argparse
+import itertools
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from inference_pool import InferencePool  # noqa: E402
+
+
+def image_params(args, seed):
+    return dict(
+        prompt=args.prompt, negative_prompt="", seed=seed, scheduler="pndm",
+        num_inference_steps=args.steps, guidance_scale=7.5, width=args.size, height=args.size
+    )
+
+
+def measure(replicas, threads, args):
+    pool = InferencePool(replicas, threads_per_replica=threads)
+    pool.start()
+    try:
+        pool.wait_until_loaded()
+        if pool.is_failed():
+            raise SystemExit("The model failed to load; see the replica output above.")
+        lock = threading.Lock()
+
+        def drive(next_seed, count):
+            # Like the generation queue's workers: one caller per replica, one job at a time
+            while True:
+                with lock:
+                    if next_seed[0] >= count:
+                        return
+                    seed = next_seed[0]
+                    next_seed[0] += 1
+                pool.run_batch([image_params(args, seed)], lambda *progress: None)
+
+        def run(count):
+            next_seed = [0]
+            drivers = [threading.Thread(target=drive, args=(next_seed, count)) for _ in range(replicas)]
+            for driver in drivers:
+                driver.start()
+            for driver in drivers:
+                driver.join()
+
+        run(replicas)  # warm-up: one image per replica
+        started = time.perf_counter()
+        run(args.images)
+        elapsed = time.perf_counter() - started
+    finally:
+        pool.stop()
+    return args.images * 60 / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--replicas", default="1,2,4")
+    parser.add_argument("--threads", default="2,4,8")
+    parser.add_argument("--images", type=int, default=16, help="timed images per combination")
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--size", type=int, default=512)
+    parser.add_argument("--prompt", default="a charcoal sketch of a lighthouse on a cliff")
+    args = parser.parse_args()
+
+    cpus = len(os.sched_getaffinity(0))
+    combinations = [
+        (replicas, threads)
+        for replicas, threads in itertools.product(
+            [int(n) for n in args.replicas.split(",")], [int(n) for n in args.threads.split(",")])
+        if replicas * threads <= cpus
+    ]
+    print(f"{cpus} CPUs, {args.steps} steps, {args.size}x{args.size}, {args.images} images per combination")
+
+    results = {}
+    for replicas, threads in combinations:
+        results[(replicas, threads)] = measure(replicas, threads, args)
+        print(f"{replicas:3d} replicas x {threads:3d} threads: {results[(replicas, threads)]:7.2f} images/min")
+
+    if results:
+        (replicas, threads), best = max(results.items(), key=lambda item: item[1])
+        print(f"Best: INFERENCE_REPLICAS={replicas} INFERENCE_THREADS_PER_REPLICA={threads} ({best:.2f} images/min)")
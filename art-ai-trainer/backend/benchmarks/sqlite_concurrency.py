@@ -0,0 +1,178 @@
+"""Feed reads vs. like/comment writes on SQLite, before and after the engine tuning.
+
+Builds a throwaway database shaped like the app's (posts, likes, comments),
+then runs reader threads that load feed pages and writer threads that like
+and comment, once with SQLite's defaults and no lookup indexes and once with
+db_engine's pragmas and the indexes from the migrations. Run from the
+backend folder:
+
+    python benchmarks/sqlite_concurrency.py --readers 8 --writers 2 --seconds 10
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db_engine import configure_engine  # noqa: E402
+
+
+SCHEMA = (
+    "CREATE TABLE community_post (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, caption TEXT,"
+    " created_at DATETIME, like_count INTEGER NOT NULL DEFAULT 0, comment_count INTEGER NOT NULL DEFAULT 0)",
+    'CREATE TABLE "like" (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, post_id INTEGER NOT NULL,'
+    " created_at DATETIME, UNIQUE (user_id, post_id))",
+    "CREATE TABLE comment (id INTEGER PRIMARY KEY, text TEXT NOT NULL, user_id INTEGER NOT NULL,"
+    " post_id INTEGER NOT NULL, created_at DATETIME)",
+)
+
+INDEXES = (
+    "CREATE INDEX ix_community_post_created_at_id ON community_post (created_at, id)",
+    'CREATE INDEX ix_like_post_id ON "like" (post_id)',
+    "CREATE INDEX ix_comment_post_id_created_at ON comment (post_id, created_at)",
+)
+
+FEED_PAGE = text(
+    "SELECT id, like_count, comment_count FROM community_post"
+    " ORDER BY created_at DESC, id DESC LIMIT 20 OFFSET :offset"
+)
+PAGE_COMMENTS = text(
+    "SELECT post_id, text FROM comment WHERE post_id IN (SELECT value FROM json_each(:ids))"
+    " ORDER BY post_id, created_at"
+)
+LIKED_BY_USER = text(
+    'SELECT post_id FROM "like" WHERE post_id IN (SELECT value FROM json_each(:ids))'
+)
+
+
+def build_database(path, posts, likes, comments, with_indexes):
+    conn = sqlite3.connect(path)
+    for statement in SCHEMA + (INDEXES if with_indexes else ()):
+        conn.execute(statement)
+    rng = random.Random(0)
+    conn.executemany(
+        "INSERT INTO community_post (id, user_id, caption, created_at) VALUES (?, ?, ?, datetime('now', ?))",
+        [(i, rng.randrange(500), f"post {i}", f"-{posts - i} minutes") for i in range(1, posts + 1)]
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO \"like\" (user_id, post_id, created_at) VALUES (?, ?, datetime('now'))",
+        [(rng.randrange(5000), rng.randrange(1, posts + 1)) for _ in range(likes)]
+    )
+    conn.executemany(
+        "INSERT INTO comment (text, user_id, post_id, created_at) VALUES (?, ?, ?, datetime('now'))",
+        [("nice", rng.randrange(5000), rng.randrange(1, posts + 1)) for _ in range(comments)]
+    )
+    conn.execute(
+        'UPDATE community_post SET like_count = (SELECT count(*) FROM "like" WHERE post_id = community_post.id),'
+        " comment_count = (SELECT count(*) FROM comment WHERE post_id = community_post.id)"
+    )
+    conn.commit()
+    conn.close()
+
+
+def reader(engine, stop, latencies, errors):
+    rng = random.Random()
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            with engine.connect() as conn:
+                rows = conn.execute(FEED_PAGE, {"offset": 20 * rng.randrange(5)}).fetchall()
+                ids = "[" + ",".join(str(row.id) for row in rows) + "]"
+                conn.execute(PAGE_COMMENTS, {"ids": ids}).fetchall()
+                conn.execute(LIKED_BY_USER, {"ids": ids}).fetchall()
+        except OperationalError:
+            errors.append(1)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+def writer(engine, posts, stop, latencies, errors):
+    rng = random.Random()
+    while not stop.is_set():
+        post_id = rng.randrange(1, posts + 1)
+        started = time.perf_counter()
+        try:
+            with engine.begin() as conn:
+                if rng.random() < 0.7:
+                    inserted = conn.execute(
+                        text("INSERT OR IGNORE INTO \"like\" (user_id, post_id, created_at) VALUES (:u, :p, datetime('now'))"),
+                        {"u": rng.randrange(100000), "p": post_id}
+                    ).rowcount
+                    conn.execute(
+                        text("UPDATE community_post SET like_count = like_count + :n WHERE id = :p"),
+                        {"n": inserted, "p": post_id}
+                    )
+                else:
+                    conn.execute(
+                        text("INSERT INTO comment (text, user_id, post_id, created_at) VALUES ('hi', :u, :p, datetime('now'))"),
+                        {"u": rng.randrange(100000), "p": post_id}
+                    )
+                    conn.execute(
+                        text("UPDATE community_post SET comment_count = comment_count + 1 WHERE id = :p"),
+                        {"p": post_id}
+                    )
+        except OperationalError:
+            errors.append(1)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+def percentile(values, fraction):
+    if not values:
+        return float("nan")
+    return sorted(values)[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(label, tuned, args):
+    folder = tempfile.mkdtemp(prefix="sqlite-bench-")
+    path = os.path.join(folder, "bench.db")
+    build_database(path, args.posts, args.likes, args.comments, with_indexes=tuned)
+
+    # Without tuning, give up on a locked database after 1 s rather than Python's default 5 s,
+    # so contention shows up as errors instead of disappearing into the latency numbers
+    engine = create_engine(f"sqlite:///{path}", pool_size=args.readers + args.writers,
+                           connect_args={} if tuned else {"timeout": 1})
+    if tuned:
+        configure_engine(engine)
+
+    stop = threading.Event()
+    read_latencies, write_latencies, read_errors, write_errors = [], [], [], []
+    threads = [threading.Thread(target=reader, args=(engine, stop, read_latencies, read_errors))
+               for _ in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(engine, args.posts, stop, write_latencies, write_errors))
+                for _ in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+
+    print(f"{label}:")
+    print(f"  reads   {len(read_latencies) / args.seconds:8.1f}/s  p50 {statistics.median(read_latencies or [0]) * 1000:7.2f} ms"
+          f"  p95 {percentile(read_latencies, 0.95) * 1000:7.2f} ms  errors {len(read_errors)}")
+    print(f"  writes  {len(write_latencies) / args.seconds:8.1f}/s  p50 {statistics.median(write_latencies or [0]) * 1000:7.2f} ms"
+          f"  p95 {percentile(write_latencies, 0.95) * 1000:7.2f} ms  errors {len(write_errors)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--likes", type=int, default=100000)
+    parser.add_argument("--comments", type=int, default=30000)
+    args = parser.parse_args()
+
+    run("SQLite defaults, no lookup indexes", tuned=False, args=args)
+    run("WAL + pragmas + indexes", tuned=True, args=args)
@@ -0,0 +1,142 @@
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+import threading
+
+
+# Image types we store, by MIME type, with the magic bytes every such file starts with
+IMAGE_TYPES = {
+    "image/png": ("png", (b"\x89PNG\r\n\x1a\n",)),
+    "image/jpeg": ("jpg", (b"\xff\xd8\xff",)),
+    "image/gif": ("gif", (b"GIF87a", b"GIF89a")),
+}
+
+# Enough leading bytes to recognise every type above
+HEADER_BYTES = 8
+
+# Streams are copied to disk this much at a time
+CHUNK_SIZE = 64 * 1024
+
+DATA_URL_RE = re.compile(r"^data:(?P<mime>[\w.+-]+/[\w.+-]+)(?:;[^,]*)?;base64,", re.IGNORECASE)
+BLOB_FILENAME_RE = re.compile(r"^[0-9a-f]{64}\.(png|jpg|gif)$")
+
+
+class InvalidImageError(ValueError):
+    """Raised for uploads that are not a supported, well-formed image; the message is safe to show."""
+
+
+class BlobTooLargeError(Exception):
+    """Raised when a streamed upload grows past its size limit."""
+
+
+def sniff_image_type(data):
+    """Return the file extension for image bytes, judged by their header, or None."""
+    for extension, signatures in IMAGE_TYPES.values():
+        if any(data.startswith(signature) for signature in signatures):
+            return extension
+    return None
+
+
+def _sniff_or_raise(head):
+    extension = sniff_image_type(head)
+    if extension is None:
+        raise InvalidImageError("File is not a PNG, JPEG or GIF image")
+    return extension
+
+
+def decode_data_url(data_url):
+    """Decode a base64 image data URL into (bytes, extension)."""
+    match = DATA_URL_RE.match(data_url or "")
+    if not match:
+        raise InvalidImageError("Expected a base64 image data URL")
+    mime = match.group("mime").lower()
+    if mime not in IMAGE_TYPES:
+        raise InvalidImageError(f"Unsupported image type {mime}")
+    try:
+        data = base64.b64decode(data_url[match.end():], validate=True)
+    except (binascii.Error, ValueError):
+        raise InvalidImageError("Image data is not valid base64")
+
+    # Trust the bytes, not the declared type
+    extension = sniff_image_type(data)
+    if extension != IMAGE_TYPES[mime][0]:
+        raise InvalidImageError(f"Image data does not match its declared type {mime}")
+    return data, extension
+
+
+class BlobStore:
+    """Content-addressed image files in a single folder.
+
+    Each blob is saved as <sha256 of its bytes>.<extension>, so identical
+    uploads share one file and a name never refers to different content.
+    The database keeps only these short names. Blobs are never deleted
+    here, since community posts may link to the same file as a drawing.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+
+    def path(self, filename):
+        return os.path.join(self.folder, filename)
+
+    def exists(self, filename):
+        return bool(BLOB_FILENAME_RE.match(filename or "")) and os.path.isfile(self.path(filename))
+
+    def save(self, data, extension):
+        filename = f"{hashlib.sha256(data).hexdigest()}.{extension}"
+        path = self.path(filename)
+        if os.path.exists(path):
+            return filename
+        os.makedirs(self.folder, exist_ok=True)
+        # Write to a temporary name first so readers never see a partial file
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return filename
+
+    def save_data_url(self, data_url):
+        data, extension = decode_data_url(data_url)
+        return self.save(data, extension)
+
+    def save_stream(self, stream, max_bytes, chunk_size=CHUNK_SIZE):
+        """Copy an image from a file-like object to the store without holding it in memory.
+
+        The type is taken from the first few bytes; anything that is not a
+        supported image, or that grows past `max_bytes`, is discarded.
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.folder, suffix=".tmp")
+        try:
+            digest = hashlib.sha256()
+            size = 0
+            head = b""
+            extension = None
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    chunk = stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise BlobTooLargeError(f"Uploads are limited to {max_bytes // (1024 * 1024)} MB")
+                    if extension is None:
+                        # Give up as soon as the header is in, rather than after reading the whole body
+                        head += chunk[:HEADER_BYTES - len(head)]
+                        if len(head) >= HEADER_BYTES:
+                            extension = _sniff_or_raise(head)
+                    digest.update(chunk)
+                    f.write(chunk)
+
+            if extension is None:
+                extension = _sniff_or_raise(head)
+
+            filename = f"{digest.hexdigest()}.{extension}"
+            os.replace(tmp_path, self.path(filename))
+            return filename
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
@@ -0,0 +1,66 @@
+"""Maintenance commands, run as `flask --app app <command>`."""
+import os
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from blob_store import InvalidImageError
+from extensions import db
+from models import Drawing, reconcile_post_counts
+from storage import allowed_file, blob_store, image_variants
+
+
+@click.command("reconcile-post-counts")
+@with_appcontext
+def reconcile_post_counts_command():
+    """Rebuild community_post.like_count and comment_count from the source tables."""
+    fixed = reconcile_post_counts()
+    print(f"Reconciled counters on {fixed} post(s).")
+
+
+@click.command("move-drawings-to-blob-store")
+@with_appcontext
+def move_drawings_to_blob_store_command():
+    """Write drawings still stored inline as data URLs to the blob store."""
+    moved = failed = 0
+    # Fetch ids first so only one multi-megabyte data URL is held at a time
+    drawing_ids = [
+        drawing_id for (drawing_id,) in
+        db.session.query(Drawing.id).filter(Drawing.image_key.like("data:%")).all()
+    ]
+    for drawing_id in drawing_ids:
+        drawing = db.session.get(Drawing, drawing_id)
+        try:
+            drawing.image_key = blob_store().save_data_url(drawing.image_key)
+            image_variants().submit(drawing.image_key)
+        except InvalidImageError as e:
+            print(f"Skipping drawing {drawing_id}: {e}")
+            failed += 1
+            continue
+        db.session.commit()
+        db.session.expunge(drawing)
+        moved += 1
+    print(f"Moved {moved} drawing(s) to {blob_store().folder}; {failed} could not be decoded.")
+
+
+@click.command("create-image-variants")
+@with_appcontext
+def create_image_variants_command():
+    """Write missing resized variants for every image already in the uploads folder."""
+    count = 0
+    for entry in sorted(os.scandir(current_app.config['UPLOAD_FOLDER']), key=lambda entry: entry.name):
+        if entry.is_file() and allowed_file(entry.name):
+            try:
+                image_variants().write_variants(entry.name)
+            except Exception as e:
+                print(f"Skipping {entry.name}: {e}")
+                continue
+            count += 1
+    print(f"Checked variants for {count} image(s).")
+
+
+def register_commands(app):
+    app.cli.add_command(reconcile_post_counts_command)
+    app.cli.add_command(move_drawings_to_blob_store_command)
+    app.cli.add_command(create_image_variants_command)
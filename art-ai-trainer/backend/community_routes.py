@@ -0,0 +1,179 @@
+import base64
+import json
+from datetime import datetime
+
+from flask import Blueprint, request, jsonify
+from flask_login import login_required, current_user
+from sqlalchemy import desc, or_, and_, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.exc import StaleDataError
+
+from extensions import db
+from models import CommunityPost, Like, Comment
+
+
+community_bp = Blueprint("community", __name__)
+
+
+@community_bp.route("/api/create_post", methods=["POST"])
+@login_required
+def create_community_post():
+    data = request.json
+    image_url = data.get("image_url")
+    caption = data.get("caption")
+
+    if not image_url:
+        return jsonify({"error": "Image URL is required to create a post"}), 400
+
+    new_post = CommunityPost(
+        image_url=image_url,
+        caption=caption,
+        user_id=current_user.id
+    )
+    db.session.add(new_post)
+    db.session.commit()
+
+    return jsonify(new_post.to_dict(include_likes_count=True, include_comments=True)), 201
+
+
+# Feed pages: default and maximum number of posts per request
+FEED_PAGE_SIZE = 20
+MAX_FEED_PAGE_SIZE = 50
+
+
+def encode_feed_cursor(sort_by, values):
+    # Opaque token holding the sort keys of the last post on a page
+    payload = json.dumps({"sort_by": sort_by, "after": values}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_feed_cursor(token, sort_by):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        values = payload["after"]
+        if payload["sort_by"] != sort_by or len(values) != 2:
+            raise ValueError("cursor does not match sort order")
+        if sort_by == "newest":
+            return datetime.fromisoformat(values[0]), int(values[1])
+        return int(values[0]), int(values[1])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+@community_bp.route("/api/get_community_posts", methods=["GET"])
+def get_community_posts():
+    # Keyset pagination: each page continues strictly after the cursor's (sort key, id),
+    # so the cost of a page doesn't grow with how deep into the feed it is.
+    sort_by = request.args.get("sort_by", "newest") # Default to 'newest'
+    cursor = request.args.get("cursor")
+
+    try:
+        limit = min(max(int(request.args.get("limit", FEED_PAGE_SIZE)), 1), MAX_FEED_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"error": "limit must be a number"}), 400
+
+    if sort_by == "newest":
+        sort_key = CommunityPost.created_at
+        query = CommunityPost.query.options(joinedload(CommunityPost.poster))
+    elif sort_by == "most_liked":
+        # Served by the (like_count, id) index, no aggregation needed
+        sort_key = CommunityPost.like_count
+        query = CommunityPost.query.options(joinedload(CommunityPost.poster))
+    else:
+        return jsonify({"error": "Invalid sort_by parameter. Use 'newest' or 'most_liked'."}), 400
+
+    if cursor:
+        try:
+            after_key, after_id = decode_feed_cursor(cursor, sort_by)
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+        if db.engine.dialect.name == "postgresql":
+            # Postgres turns a row comparison into one range scan of the (sort key, id) index
+            query = query.filter(tuple_(sort_key, CommunityPost.id) < tuple_(after_key, after_id))
+        else:
+            query = query.filter(or_(
+                sort_key < after_key,
+                and_(sort_key == after_key, CommunityPost.id < after_id)
+            ))
+
+    # One extra row tells us whether there is a next page
+    rows = query.order_by(desc(sort_key), desc(CommunityPost.id)).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    posts = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        last = posts[-1]
+        last_key = last.created_at.isoformat() if sort_by == "newest" else last.like_count
+        next_cursor = encode_feed_cursor(sort_by, [last_key, last.id])
+
+    return jsonify({
+        "posts": CommunityPost.serialize_posts(posts),
+        "next_cursor": next_cursor
+    }), 200
+
+
+@community_bp.route("/api/like_post/<int:post_id>", methods=["POST"])
+@login_required
+def like_post(post_id):
+    post = CommunityPost.query.get(post_id)
+    if not post:
+        return jsonify({"error": "Post not found"}), 404
+
+    existing_like = Like.query.filter_by(user_id=current_user.id, post_id=post_id).first()
+
+    # The post's like_count is updated in the same transaction by the Like hooks
+    if existing_like:
+        db.session.delete(existing_like)
+        message = "Post unliked"
+    else:
+        db.session.add(Like(user_id=current_user.id, post_id=post_id))
+        message = "Post liked"
+
+    try:
+        db.session.commit()
+    except (IntegrityError, StaleDataError):
+        # A concurrent request from the same user already made this change
+        db.session.rollback()
+
+    return jsonify({"message": message, "likes_count": post.like_count}), 200
+
+
+@community_bp.route("/api/comment_post/<int:post_id>", methods=["POST"])
+@login_required
+def comment_post(post_id):
+    data = request.json
+    comment_text = data.get("comment")
+
+    if not comment_text or not comment_text.strip():
+        return jsonify({"error": "Comment text cannot be empty"}), 400
+
+    post = CommunityPost.query.get(post_id)
+    if not post:
+        return jsonify({"error": "Post not found"}), 404
+
+    new_comment = Comment(
+        text=comment_text.strip(),
+        user_id=current_user.id,
+        post_id=post_id
+    )
+    db.session.add(new_comment)
+    db.session.commit()
+
+    return jsonify(new_comment.to_dict()), 201
+
+@community_bp.route("/api/delete_post/<int:post_id>", methods=["DELETE"])
+@login_required
+def delete_community_post(post_id):
+    post = CommunityPost.query.get(post_id)
+
+    if not post:
+        return jsonify({"error": "Post not found"}), 404
+
+    if post.user_id != current_user.id:
+        return jsonify({"error": "Unauthorized to delete this post"}), 403
+
+    db.session.delete(post)
+    db.session.commit()
+    return jsonify({"message": "Post deleted successfully"}), 200
@@ -0,0 +1,31 @@
+import os
+
+from db_engine import database_url
+
+
+class Config:
+    """Default settings; create_app(config) overrides any of them."""
+
+    SECRET_KEY = 'a_very_secret_and_complex_key_that_is_not_just_your_secret_key_for_real_use'
+    SQLALCHEMY_DATABASE_URI = database_url()
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # SQLALCHEMY_ENGINE_OPTIONS defaults to db_engine.engine_options() for the chosen database
+
+    SESSION_COOKIE_SAMESITE = "None"
+    SESSION_COOKIE_SECURE = True
+    SESSION_COOKIE_HTTPONLY = True
+    CORS_ORIGINS = ["http://localhost:3000", "https://localhost:3000", "https://localhost:5001"] # ADDED https://localhost:5001
+    CORS_SUPPORTS_CREDENTIALS = True
+
+    UPLOAD_FOLDER = 'static/uploads'
+    PUBLIC_BASE_URL = "https://localhost:5001" # Use your Flask port (5001)
+    # Largest image accepted by the streaming upload endpoints
+    MAX_UPLOAD_BYTES = 16 * 1024 * 1024
+    # Threads writing the resized copies of uploaded images
+    IMAGE_VARIANT_WORKERS = int(os.environ.get("IMAGE_VARIANT_WORKERS", 2))
+
+    # Set to "x-accel-redirect" (nginx) or "x-sendfile" (Apache/lighttpd) when a proxy in front of
+    # the app can send media files itself; see media.py
+    MEDIA_ROOT = 'static'
+    MEDIA_SENDFILE_MODE = os.environ.get("MEDIA_SENDFILE_MODE", "")
+    MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get("MEDIA_ACCEL_REDIRECT_PREFIX", "/_media/")
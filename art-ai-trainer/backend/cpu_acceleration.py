@@ -0,0 +1,114 @@
+"""Opt-in speedups for running the diffusion pipeline on a CPU.
+
+Enabled with CPU_ACCELERATION=1 and tuned with:
+
+    TORCH_NUM_THREADS       intra-op threads (default: CPUs this process may run on)
+    TORCH_INTEROP_THREADS   inter-op threads (default: torch's own)
+    CPU_COMPILE             "none" (default) or "torch_compile" for the UNet and VAE decoder
+    CPU_BF16                "auto" (default), "on" or "off": bfloat16 autocast, used by
+                            "auto" only when the CPU has native bf16 instructions
+"""
+import contextlib
+import os
+
+
+COMPILE_MODES = ("none", "torch_compile")
+BF16_MODES = ("auto", "on", "off")
+
+# /proc/cpuinfo flags for native bfloat16 arithmetic (Cooper Lake / Sapphire Rapids and later)
+BF16_CPU_FLAGS = ("avx512_bf16", "amx_bf16")
+
+
+def _env_int(name):
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+def available_cpus():
+    # Respects taskset and cgroup cpusets, which torch's default thread count does not
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def cpu_has_native_bf16():
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    flags = line.split(":", 1)[1].split()
+                    return any(flag in flags for flag in BF16_CPU_FLAGS)
+    except OSError:
+        pass
+    return False
+
+
+class CpuAcceleration:
+    """Thread, memory-format, compilation and precision settings for CPU inference."""
+
+    def __init__(self, enabled=False, num_threads=None, interop_threads=None, compile="none", bf16="auto"):
+        if compile not in COMPILE_MODES:
+            raise ValueError(f"CPU_COMPILE must be one of {COMPILE_MODES}")
+        if bf16 not in BF16_MODES:
+            raise ValueError(f"CPU_BF16 must be one of {BF16_MODES}")
+        self.enabled = enabled
+        self.num_threads = num_threads or available_cpus()
+        self.interop_threads = interop_threads
+        self.compile = compile
+        self.use_bf16 = enabled and (bf16 == "on" or (bf16 == "auto" and cpu_has_native_bf16()))
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            enabled=os.environ.get("CPU_ACCELERATION", "0") == "1",
+            num_threads=_env_int("TORCH_NUM_THREADS"),
+            interop_threads=_env_int("TORCH_INTEROP_THREADS"),
+            compile=os.environ.get("CPU_COMPILE", "none"),
+            bf16=os.environ.get("CPU_BF16", "auto"),
+        )
+
+    def describe(self):
+        if not self.enabled:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            "num_threads": self.num_threads,
+            "compile": self.compile,
+            "bf16": self.use_bf16,
+        }
+
+    def configure_threads(self):
+        """Set torch's thread pools; must run before the first op (interop threads can't change later)."""
+        import torch
+
+        torch.set_num_threads(self.num_threads)
+        if self.interop_threads:
+            try:
+                torch.set_num_interop_threads(self.interop_threads)
+            except RuntimeError as e:
+                print(f"Could not set inter-op threads: {e}")
+
+    def apply(self, pipeline):
+        """Prepare a CPU float32 pipeline in place. Does nothing unless enabled."""
+        if not self.enabled:
+            return pipeline
+        import torch
+
+        self.configure_threads()
+        # NHWC lets oneDNN's convolutions skip layout reorders between layers
+        pipeline.unet.to(memory_format=torch.channels_last)
+        pipeline.vae.to(memory_format=torch.channels_last)
+
+        if self.compile == "torch_compile":
+            # Compiled lazily on first use, once per batch size; the first generations are slow
+            pipeline.unet = torch.compile(pipeline.unet)
+            pipeline.vae.decoder = torch.compile(pipeline.vae.decoder)
+        return pipeline
+
+    def inference_context(self):
+        """Context manager to run the pipeline under: bf16 autocast when enabled."""
+        if not self.use_bf16:
+            return contextlib.nullcontext()
+        import torch
+        return torch.autocast("cpu", dtype=torch.bfloat16)
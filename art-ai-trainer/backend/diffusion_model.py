@@ -0,0 +1,156 @@
+import contextlib
+import threading
+
+from cpu_acceleration import CpuAcceleration
+from quantization import Quantization
+
+
+# Choose your model. "runwayml/stable-diffusion-v1-5" is a good balance for 8GB RAM.
+MODEL_ID = "runwayml/stable-diffusion-v1-5"
+
+# Model lifecycle states reported by the readiness endpoint
+MODEL_NOT_LOADED = "not_loaded"
+MODEL_LOADING = "loading"
+MODEL_READY = "ready"
+MODEL_FAILED = "failed"
+
+# Schedulers selectable per request. "pndm" is the pipeline's own default;
+# the others are built from its config the first time they are used.
+SCHEDULERS = {
+    "pndm": None,
+    "dpmsolver++": ("DPMSolverMultistepScheduler", {"algorithm_type": "dpmsolver++"}),
+    "euler_a": ("EulerAncestralDiscreteScheduler", {}),
+}
+
+# Both set by configure_from_env()
+cpu_acceleration = None
+quantization = None
+
+_pipeline = None
+_schedulers = {}
+_status = MODEL_NOT_LOADED
+_error = None
+_device = None
+_load_lock = threading.Lock()
+
+
+def configure_from_env():
+    """Read the CPU acceleration and quantization settings from the environment.
+
+    Runs at import; inference_pool replicas run it again once their own
+    environment and CPU affinity are in place.
+    """
+    global cpu_acceleration, quantization
+    # Opt-in CPU speedups (threads, channels_last, torch.compile, bf16); see cpu_acceleration.py
+    cpu_acceleration = CpuAcceleration.from_env()
+    # Opt-in int8 weights for the UNet and text encoder on CPU; see quantization.py
+    quantization = Quantization.from_env()
+    # Settled before loading, since weights_id() depends on it:
+    # the int8 kernels take float32 activations, not bfloat16 ones from autocast
+    if quantization.enabled and cpu_acceleration.use_bf16:
+        print("bf16 autocast is disabled while the model is quantized.")
+        cpu_acceleration.use_bf16 = False
+
+
+configure_from_env()
+
+
+def model_status():
+    data = {"status": _status, "model_id": MODEL_ID}
+    if _device:
+        data["device"] = _device
+    if _device == "cpu":
+        data["cpu_acceleration"] = cpu_acceleration.describe()
+        data["quantization"] = quantization.mode
+    if _error:
+        data["error"] = _error
+    return data
+
+
+def is_failed():
+    return _status == MODEL_FAILED
+
+
+def _load_pipeline():
+    global _pipeline, _status, _error, _device
+
+    print("\n--- Initializing Stable Diffusion model for image generation API ---")
+    print("This may take a while, especially on the first run (downloading model weights)...")
+    _status = MODEL_LOADING
+
+    try:
+        # torch and diffusers are imported here, not at module level, so that
+        # importing the app (migrations, tests, non-ML routes) stays fast.
+        import torch
+        from diffusers import StableDiffusionPipeline
+
+        # Device setup for the ML component
+        device = "mps" if torch.backends.mps.is_available() else "cpu"
+        torch_dtype = torch.float16 if device == "mps" else torch.float32
+
+        pipeline = StableDiffusionPipeline.from_pretrained(MODEL_ID, torch_dtype=torch_dtype)
+        # Move the model to the determined device
+        pipeline = pipeline.to(device)
+        if device == "cpu":
+            quantization.apply(pipeline, MODEL_ID)
+            cpu_acceleration.apply(pipeline)
+        elif quantization.enabled:
+            print(f"Quantization is only supported on the CPU; running unquantized on {device}.")
+    except Exception as e:
+        print(f"\n--- ERROR: FAILED TO LOAD STABLE DIFFUSION MODEL FOR API ---")
+        print(f"Reason: {e}")
+        print("Image generation API will be disabled due to this failure.")
+        print("--- Model initialization failed ---")
+        _error = str(e)
+        _status = MODEL_FAILED
+        return
+
+    _pipeline = pipeline
+    _schedulers["pndm"] = pipeline.scheduler
+    _device = device
+    _status = MODEL_READY
+    print(f"Stable Diffusion model '{MODEL_ID}' loaded successfully on {device} for API.")
+    print("--- Model initialization complete ---")
+
+
+def get_pipeline():
+    """Return the loaded pipeline, loading it on first use. Returns None if loading failed."""
+    if _status == MODEL_NOT_LOADED or _status == MODEL_LOADING:
+        with _load_lock:
+            if _status == MODEL_NOT_LOADED:
+                _load_pipeline()
+    return _pipeline
+
+
+def start_warmup():
+    """Load the pipeline on a background thread so the first request doesn't wait for it."""
+    if _status != MODEL_NOT_LOADED:
+        return
+    threading.Thread(target=get_pipeline, name="diffusion-warmup", daemon=True).start()
+
+
+def weights_id():
+    """The model id plus anything that changes its outputs, for keying cached results."""
+    model_id = quantization.weights_id(MODEL_ID)
+    if cpu_acceleration.use_bf16:
+        # Autocast changes the images and the prompt embeddings, not just the speed
+        model_id += "+autocast-bfloat16"
+    return model_id
+
+
+def inference_context():
+    """Context manager to run the pipeline under (bf16 autocast on CPUs that support it, if enabled)."""
+    if _device == "cpu":
+        return cpu_acceleration.inference_context()
+    return contextlib.nullcontext()
+
+
+def use_scheduler(pipeline, name):
+    """Switch `pipeline` to one of SCHEDULERS. Only call from the thread that runs the pipeline."""
+    if name not in _schedulers:
+        import diffusers
+
+        class_name, options = SCHEDULERS[name]
+        scheduler_class = getattr(diffusers, class_name)
+        _schedulers[name] = scheduler_class.from_config(_schedulers["pndm"].config, **options)
+    pipeline.scheduler = _schedulers[name]
@@ -0,0 +1,167 @@
+from flask import Blueprint, current_app, request, jsonify
+from flask_login import login_required, current_user
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from blob_store import InvalidImageError, BlobTooLargeError
+from extensions import db
+from models import Drawing
+from storage import allowed_file, blob_store, image_variants, upload_url
+
+
+drawings_bp = Blueprint("drawings", __name__)
+
+
+@drawings_bp.route('/user-drawings', methods=['GET'])
+@login_required
+def get_user_drawings():
+    user_drawings = Drawing.query.filter_by(user_id=current_user.id).all()
+    return jsonify([drawing.to_dict() for drawing in user_drawings]), 200
+
+
+@drawings_bp.route("/upload-drawing", methods=["POST"])
+@login_required
+def upload_drawing():
+    data = request.json
+    name = data.get("name")
+    image_url = data.get("image_url")
+
+    if not name or not image_url:
+        return jsonify({"error": "Missing name or image_url"}), 400
+
+    try:
+        image_key = blob_store().save_data_url(image_url)
+    except InvalidImageError as e:
+        return jsonify({"error": str(e)}), 400
+    image_variants().submit(image_key)
+
+    drawing = Drawing(name=name, image_key=image_key, user_id=current_user.id)
+    db.session.add(drawing)
+    db.session.commit()
+
+    return jsonify(drawing.to_dict()), 201
+
+
+# Room for multipart framing and the other form fields on top of the image itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+def upload_too_large_response():
+    max_bytes = current_app.config['MAX_UPLOAD_BYTES']
+    return jsonify({"error": f"Uploads are limited to {max_bytes // (1024 * 1024)} MB"}), 413
+
+
+def limit_upload_size():
+    # Call before touching request.files or request.form: parsing them reads (and spools) the
+    # whole body. Returns an error response for an oversized upload, else None.
+    limit = current_app.config['MAX_UPLOAD_BYTES'] + MULTIPART_OVERHEAD_BYTES
+    # Also stops Werkzeug reading a body sent without a Content-Length past the limit
+    request.max_content_length = limit
+    if request.content_length and request.content_length > limit:
+        return upload_too_large_response()
+    return None
+
+
+def save_uploaded_image(stream):
+    # Streams an upload into the blob store; returns (filename, None) or (None, error response)
+    try:
+        return blob_store().save_stream(stream, current_app.config['MAX_UPLOAD_BYTES']), None
+    except (BlobTooLargeError, RequestEntityTooLarge):
+        return None, upload_too_large_response()
+    except InvalidImageError as e:
+        return None, (jsonify({"error": str(e)}), 400)
+
+
+@drawings_bp.route("/upload-drawing-file", methods=["POST"])
+@login_required
+def upload_drawing_file():
+    # Takes the image as multipart form data ("file" and "name") or as the raw request body
+    # with ?name=..., and streams it to disk instead of buffering a base64 JSON string
+    error = limit_upload_size()
+    if error:
+        return error
+    if request.mimetype == "multipart/form-data":
+        try:
+            file = request.files.get("file")
+        except RequestEntityTooLarge:
+            return upload_too_large_response()
+        if not file or file.filename == '':
+            return jsonify({"error": "No file part"}), 400
+        name = request.form.get("name") or file.filename
+        stream = file.stream
+    else:
+        name = request.args.get("name")
+        stream = request.stream
+
+    if not name:
+        return jsonify({"error": "Missing name"}), 400
+
+    image_key, error = save_uploaded_image(stream)
+    if error:
+        return error
+    image_variants().submit(image_key)
+
+    drawing = Drawing(name=name, image_key=image_key, user_id=current_user.id)
+    db.session.add(drawing)
+    db.session.commit()
+
+    return jsonify(drawing.to_dict()), 201
+
+
+@drawings_bp.route("/my-drawings", methods=["GET"])
+@login_required
+def my_drawings():
+    drawings = Drawing.query.filter_by(user_id=current_user.id).all()
+    return jsonify([d.to_dict() for d in drawings]), 200
+
+
+@drawings_bp.route("/rename-drawing", methods=["POST"])
+@login_required
+def rename_drawing():
+    data = request.json
+    drawing_id = data.get("id")
+    new_name = data.get("name")
+
+    if not drawing_id or not new_name:
+        return jsonify({"error": "Missing drawing ID or new name"}), 400
+
+    drawing = Drawing.query.filter_by(id=drawing_id, user_id=current_user.id).first()
+    if not drawing:
+        return jsonify({"error": "Drawing not found"}), 404
+
+    drawing.name = new_name
+    db.session.commit()
+    return jsonify(drawing.to_dict()), 200
+
+
+@drawings_bp.route("/delete-drawing/<int:id>", methods=["DELETE"])
+@login_required
+def delete_drawing(id):
+    drawing = Drawing.query.filter_by(id=id, user_id=current_user.id).first()
+    if not drawing:
+        return jsonify({"error": "Drawing not found"}), 404
+
+    db.session.delete(drawing)
+    db.session.commit()
+    return jsonify({"message": "Drawing deleted"}), 200
+
+@drawings_bp.route('/api/upload_file', methods=['POST'])
+@login_required
+def upload_file():
+    error = limit_upload_size()
+    if error:
+        return error
+    try:
+        if 'file' not in request.files:
+            return jsonify({"error": "No file part"}), 400
+    except RequestEntityTooLarge:
+        return upload_too_large_response()
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({"error": "No selected file"}), 400
+    if file and allowed_file(file.filename):
+        filename, error = save_uploaded_image(file.stream)
+        if error:
+            return error
+        image_variants().submit(filename)
+        return jsonify({"public_url": upload_url(filename)}), 200
+    return jsonify({"error": "File type not allowed"}), 400
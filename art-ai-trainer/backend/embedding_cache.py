@@ -0,0 +1,111 @@
+import collections
+import hashlib
+import os
+import threading
+
+
+class PromptEmbeddingCache:
+    """LRU cache of CLIP text-encoder outputs, keyed by the prompt's token ids.
+
+    Keying on token ids (not raw text) means every spelling that tokenizes the
+    same shares one entry. Embeddings are kept on the CPU; when `persist_dir`
+    is set they are also written there so they survive restarts.
+    """
+
+    def __init__(self, model_id, max_entries=256, persist_dir=None):
+        self.model_id = model_id
+        self.max_entries = max_entries
+        self.persist_dir = persist_dir
+        self._entries = collections.OrderedDict() # token ids -> embedding tensor
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _disk_path(self, token_ids):
+        digest = hashlib.sha256(f"{self.model_id}:{token_ids}".encode("utf-8")).hexdigest()
+        return os.path.join(self.persist_dir, f"{digest}.pt")
+
+    def _get(self, token_ids):
+        import torch
+
+        with self._lock:
+            embedding = self._entries.get(token_ids)
+            if embedding is not None:
+                self._entries.move_to_end(token_ids)
+                return embedding
+        if self.persist_dir:
+            path = self._disk_path(token_ids)
+            if os.path.exists(path):
+                try:
+                    embedding = torch.load(path, weights_only=True)
+                except Exception as e:
+                    print(f"Ignoring unreadable cached prompt embedding {path}: {e}")
+                    return None
+                self._put(token_ids, embedding, persist=False)
+                return embedding
+        return None
+
+    def _put(self, token_ids, embedding, persist=True):
+        import torch
+
+        with self._lock:
+            self._entries[token_ids] = embedding
+            self._entries.move_to_end(token_ids)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        if persist and self.persist_dir:
+            os.makedirs(self.persist_dir, exist_ok=True)
+            path = self._disk_path(token_ids)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            torch.save(embedding, tmp_path)
+            os.replace(tmp_path, path)
+
+    def encode(self, pipeline, prompts):
+        """Return text embeddings for `prompts` as one batch tensor, encoding only the cache misses.
+
+        Mirrors what StableDiffusionPipeline does internally for a plain
+        prompt, so the result can be passed as prompt_embeds or
+        negative_prompt_embeds.
+        """
+        import torch
+
+        tokenizer = pipeline.tokenizer
+        text_encoder = pipeline.text_encoder
+        device = pipeline.device
+
+        tokens = tokenizer(
+            prompts,
+            padding="max_length",
+            max_length=tokenizer.model_max_length,
+            truncation=True
+        )
+        token_ids = [tuple(ids) for ids in tokens.input_ids]
+        attention_masks = dict(zip(token_ids, tokens.attention_mask))
+
+        embeddings = {}
+        missing = []
+        for ids in token_ids:
+            if ids in embeddings or ids in missing:
+                continue
+            embedding = self._get(ids)
+            if embedding is None:
+                missing.append(ids)
+            else:
+                embeddings[ids] = embedding
+        self.hits += len(token_ids) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            # All misses go through the text encoder together
+            input_ids = torch.tensor(missing, dtype=torch.long, device=device)
+            attention_mask = None
+            if getattr(text_encoder.config, "use_attention_mask", False):
+                attention_mask = torch.tensor([attention_masks[ids] for ids in missing], device=device)
+            with torch.no_grad():
+                encoded = text_encoder(input_ids, attention_mask=attention_mask)[0]
+            for ids, embedding in zip(missing, encoded):
+                embedding = embedding.detach().to("cpu").clone()
+                embeddings[ids] = embedding
+                self._put(ids, embedding)
+
+        return torch.stack([embeddings[ids] for ids in token_ids]).to(device=device, dtype=text_encoder.dtype)
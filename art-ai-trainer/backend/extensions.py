@@ -0,0 +1,20 @@
+"""Flask extensions, created unbound so any module can import them; create_app() binds them."""
+from flask import jsonify
+from flask_sqlalchemy import SQLAlchemy
+from flask_migrate import Migrate
+from flask_login import LoginManager
+from flask_bcrypt import Bcrypt
+from flask_cors import CORS
+
+
+db = SQLAlchemy()
+migrate = Migrate()
+bcrypt = Bcrypt()
+cors = CORS()
+
+login_manager = LoginManager()
+login_manager.login_view = 'auth.login'
+
+@login_manager.unauthorized_handler
+def unauthorized():
+    return jsonify({"error": "Unauthorized"}), 401
@@ -0,0 +1,437 @@
+import itertools
+import threading
+import time
+import uuid
+
+
+# Job lifecycle states reported to clients
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED)
+
+# Priority classes, highest first. Background prefetches only run while no interactive job is waiting.
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_PREFETCH = "prefetch"
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_PREFETCH)
+
+# Weight of the newest batch in the running average of seconds per image
+SECONDS_PER_IMAGE_SMOOTHING = 0.3
+
+# Jobs can only share a pipeline call when these settings match exactly
+BATCH_SETTINGS = ("scheduler", "num_inference_steps", "guidance_scale", "width", "height")
+
+
+def batch_key(params):
+    return tuple(params.get(name) for name in BATCH_SETTINGS)
+
+
+def job_cost(params):
+    # Users' fair shares are measured in denoising steps, so a 40-step job counts for more than a 12-step one
+    return params.get("num_inference_steps") or 1
+
+
+class QueueFullError(Exception):
+    """Raised when the generation queue has no room for another job."""
+
+
+class GenerationError(Exception):
+    """A generation failure whose message is safe to show to the client."""
+
+
+class GenerationCancelled(GenerationError):
+    """Raised from the pipeline's step callback once nobody wants the images being generated."""
+
+
+class GenerationJob:
+    def __init__(self, user_id, params, priority=PRIORITY_INTERACTIVE, deadline=None):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.params = params
+        self.priority = priority
+        self.deadline = deadline # time.time() after which the job is cancelled, if set
+        self.cancelled = False
+        self.status = JOB_QUEUED
+        self.filename = None
+        self.error = None
+        self.created_at = time.time()
+        self.last_seen = self.created_at # when a client last asked about the job; see cancel_unless_seen()
+        self.started_at = None
+        self.finished_at = None
+        self.progress = None # {"step": n, "total_steps": m} while running
+        self.preview = None  # PNG data URL of a low-resolution preview of the latest step
+        self.done = threading.Event()
+        self.version = 0
+        self._changed = threading.Condition()
+        # Identical jobs submitted while this one is queued or running; they get its progress and result
+        self.followers = []
+        self.leader = None
+        self.dedup_key = None
+        # Fair-queuing start tag and arrival order; the queue runs the lowest (priority, tag, seq) first
+        self.start_tag = 0
+        self.seq = 0
+
+    def notify_changed(self):
+        # Wakes up anyone streaming this job's progress
+        with self._changed:
+            self.version += 1
+            self._changed.notify_all()
+
+    def wait_for_change(self, version, timeout):
+        """Block until the job changes after `version` (or `timeout` passes); returns the current version."""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+    def update_progress(self, step, total_steps, preview=None):
+        self.progress = {"step": step, "total_steps": total_steps}
+        if preview:
+            self.preview = preview
+        self.notify_changed()
+        for follower in list(self.followers):
+            follower.update_progress(step, total_steps, preview)
+
+    def follow(self, leader):
+        # Start out in the leader's current state; later changes are passed on by the leader
+        self.status = leader.status
+        self.started_at = leader.started_at
+        self.progress = leader.progress
+        self.preview = leader.preview
+        self.leader = leader
+        leader.followers.append(self)
+
+    def with_followers(self):
+        return [self] + list(self.followers)
+
+    def is_expired(self):
+        return self.deadline is not None and time.time() > self.deadline
+
+    def to_dict(self):
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "user_id": self.user_id,
+            "prompt": self.params.get("prompt"),
+            "seed": self.params.get("seed"),
+            "quality": self.params.get("quality"),
+            "priority": self.priority,
+        }
+        if self.progress:
+            data["progress"] = self.progress
+        if self.filename:
+            data["filename"] = self.filename
+        if self.error:
+            data["error"] = self.error
+        return data
+
+
+class GenerationQueue:
+    """Bounded, per-user fair queue of generation jobs drained by inference worker threads.
+
+    Interactive jobs always go before background prefetches. Within a
+    priority class, users get equal shares of denoising steps by start-time
+    fair queuing: each job is tagged with the later of the class's virtual
+    time and the end of its user's previous job, and the lowest tag runs
+    next. Someone queueing many jobs therefore only delays their own, and
+    each user may have at most `max_pending_per_user` jobs waiting.
+
+    The worker micro-batches: after taking the next job it waits up to
+    `batch_window` seconds for more jobs that share the same batch settings
+    (scheduler, steps, guidance, size) and hands up to `max_batch_size` of them to
+    `run_batch` at once. `run_batch` is called on the worker thread with the
+    list of jobs and must return one saved image filename per job, in order
+    (or raise, which fails the whole batch). There is one worker per
+    pipeline (`workers`), so batches only run concurrently when `run_batch`
+    spreads them over several pipelines.
+
+    Jobs submitted with a `dedup_key` are single-flight: while a job with
+    the same key is queued or running, a new one follows it instead of
+    being queued, and finishes with the same result.
+
+    A job is cancelled by cancel() or once its deadline passes. Its waiting
+    client is answered right away, but the generation itself only stops
+    when no follower still waits on it: `run_batch` should poll
+    should_stop() between denoising steps.
+    """
+
+    def __init__(self, run_batch, maxsize=16, max_batch_size=4, batch_window=0.25, finished_ttl=15 * 60, workers=1,
+                 max_pending_per_user=4):
+        self.run_batch = run_batch
+        self.maxsize = maxsize
+        self.max_pending_per_user = max_pending_per_user
+        self.max_batch_size = max(1, max_batch_size)
+        self.batch_window = batch_window
+        self.finished_ttl = finished_ttl
+        self._pending = []
+        self._jobs = {}
+        self._in_flight = {} # dedup key -> queued or running job
+        self._cond = threading.Condition()
+        self.coalesced_count = 0
+        self._virtual_time = {priority: 0 for priority in PRIORITIES}
+        self._flow_finish = {} # (user id, priority) -> end tag of the user's last queued job
+        self._seq = itertools.count()
+        self._running_count = 0
+        self._running_batches = []
+        self.seconds_per_image = None
+        self._workers = [None] * max(1, workers)
+
+    def start(self):
+        with self._cond:
+            for i, worker in enumerate(self._workers):
+                if worker is None or not worker.is_alive():
+                    worker = threading.Thread(target=self._worker_loop, name=f"generation-worker-{i}", daemon=True)
+                    worker.start()
+                    self._workers[i] = worker
+
+    def submit(self, user_id, params, dedup_key=None, priority=PRIORITY_INTERACTIVE, deadline=None):
+        job = GenerationJob(user_id, params, priority, deadline)
+        self._prune_finished()
+        with self._cond:
+            leader = self._in_flight.get(dedup_key) if dedup_key else None
+            if leader:
+                # Already being generated: share that run rather than queueing another
+                job.follow(leader)
+                if leader.status == JOB_QUEUED and PRIORITIES.index(priority) < PRIORITIES.index(leader.priority):
+                    # Someone is now waiting on a prefetch; it runs as their interactive job
+                    leader.priority = priority
+                    self._assign_tag(leader, user_id)
+                    self._notify_pending()
+                self._jobs[job.id] = job
+                self.coalesced_count += 1
+                return job
+            if sum(1 for pending in self._pending if pending.user_id == user_id) >= self.max_pending_per_user:
+                raise QueueFullError(f"You already have {self.max_pending_per_user} images waiting to be generated. "
+                                     "Please wait for one to finish.")
+            if len(self._pending) >= self.maxsize:
+                raise QueueFullError("Too many image generation requests are waiting. Please try again shortly.")
+            self._assign_tag(job, user_id)
+            self._pending.append(job)
+            self._jobs[job.id] = job
+            if dedup_key:
+                job.dedup_key = dedup_key
+                self._in_flight[dedup_key] = job
+            self._cond.notify()
+        self.start()
+        return job
+
+    def _assign_tag(self, job, user_id):
+        # Called with the lock held. Charges the job's cost to `user_id`'s flow in the job's class.
+        flow = (user_id, job.priority)
+        job.start_tag = max(self._virtual_time[job.priority], self._flow_finish.get(flow, 0))
+        job.seq = next(self._seq)
+        self._flow_finish[flow] = job.start_tag + job_cost(job.params)
+
+    def _order(self, job):
+        return (PRIORITIES.index(job.priority), job.start_tag, job.seq)
+
+    def _notify_pending(self):
+        # Queue positions changed; wake anyone streaming a waiting job
+        for job in self._pending:
+            for waiting_job in job.with_followers():
+                waiting_job.notify_changed()
+
+    def add_finished(self, user_id, params, filename):
+        # Registers an already-available result (e.g. a cache hit) as a succeeded job
+        job = GenerationJob(user_id, params)
+        job.filename = filename
+        job.status = JOB_SUCCEEDED
+        job.started_at = job.finished_at = job.created_at
+        job.done.set()
+        self._prune_finished()
+        with self._cond:
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id):
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._pending)
+
+    def describe(self, job):
+        """job.to_dict(), plus its place in the queue and a rough wait estimate while it waits."""
+        with self._cond:
+            self._expire_pending()
+        data = job.to_dict()
+        if job.done.is_set():
+            return data
+        queued_job = job.leader or job
+        with self._cond:
+            if queued_job.status != JOB_QUEUED or queued_job not in self._pending:
+                return data
+            order = self._order(queued_job)
+            position = 1 + sum(1 for pending in self._pending if self._order(pending) < order)
+            data["queue_position"] = position
+            if self.seconds_per_image is not None:
+                # Everything ahead of it, plus what is running now, shared between the workers
+                jobs_ahead = position - 1 + self._running_count
+                data["estimated_wait_seconds"] = round(jobs_ahead * self.seconds_per_image / len(self._workers), 1)
+        return data
+
+    def cancel(self, job, reason="The generation was cancelled."):
+        """Cancel one client's job; returns False if it had already finished.
+
+        If other identical requests follow it, the generation carries on for
+        them (one of them takes the job's place in the queue or batch);
+        otherwise a queued job is dropped and a running one stops at its
+        next denoising step.
+        """
+        with self._cond:
+            if job.done.is_set() or job.cancelled:
+                return False
+            job.cancelled = True
+            if job.leader:
+                if job in job.leader.followers:
+                    job.leader.followers.remove(job)
+            elif job.followers:
+                self._promote_follower(job)
+            else:
+                if job in self._pending:
+                    self._pending.remove(job)
+                    self._notify_pending()
+                if job.dedup_key and self._in_flight.get(job.dedup_key) is job:
+                    del self._in_flight[job.dedup_key]
+            job.error = reason
+            self._finish(job, JOB_CANCELLED)
+        print(f"Cancelled generation job {job.id}: {reason}")
+        return True
+
+    def cancel_unless_seen(self, job, since, reason):
+        """Cancel `job` unless a client has asked about it after `since` (a time.time() value)."""
+        with self._cond:
+            if job.last_seen > since:
+                return False
+            return self.cancel(job, reason)
+
+    def _promote_follower(self, job):
+        # Called with the lock held: the first follower inherits the job's place, followers and key
+        successor = job.followers.pop(0)
+        successor.leader = None
+        successor.followers, job.followers = job.followers, []
+        for follower in successor.followers:
+            follower.leader = successor
+        successor.priority, successor.start_tag, successor.seq = job.priority, job.start_tag, job.seq
+        successor.dedup_key = job.dedup_key
+        if job.dedup_key and self._in_flight.get(job.dedup_key) is job:
+            self._in_flight[job.dedup_key] = successor
+        if job in self._pending:
+            self._pending[self._pending.index(job)] = successor
+        for batch in self._running_batches:
+            if job in batch:
+                # The worker and run_batch see the swap through the same list
+                batch[batch.index(job)] = successor
+
+    def should_stop(self, batch, index):
+        """Whether nobody wants batch[index] any more; call from the pipeline's step callback."""
+        with self._cond:
+            for job in batch[index].with_followers():
+                if job.is_expired():
+                    self.cancel(job, "The generation took longer than its deadline allowed.")
+            return batch[index].cancelled
+
+    def _expire_pending(self):
+        # Called with the lock held (the condition's lock is reentrant)
+        for job in list(self._pending):
+            for waiting_job in job.with_followers():
+                if waiting_job.is_expired():
+                    self.cancel(waiting_job, "The generation did not start before its deadline.")
+
+    def _finish(self, job, status):
+        job.status = status
+        job.finished_at = time.time()
+        job.done.set()
+        job.notify_changed()
+
+    def _prune_finished(self):
+        cutoff = time.time() - self.finished_ttl
+        with self._cond:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.status in FINISHED_STATES and job.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def _take_matching(self, key, batch):
+        # Pull compatible jobs out of the pending queue in scheduling order
+        for job in sorted(self._pending, key=self._order):
+            if len(batch) >= self.max_batch_size:
+                break
+            if batch_key(job.params) == key:
+                batch.append(job)
+                self._pending.remove(job)
+
+    def _next_batch(self):
+        with self._cond:
+            while True:
+                self._expire_pending()
+                if self._pending:
+                    break
+                self._cond.wait()
+            first = min(self._pending, key=self._order)
+            self._pending.remove(first)
+            self._virtual_time[first.priority] = first.start_tag
+            # Flows that have caught up with virtual time no longer affect anyone's tags
+            self._flow_finish = {flow: finish for flow, finish in self._flow_finish.items()
+                                 if finish > self._virtual_time[flow[1]]}
+            key = batch_key(first.params)
+            batch = [first]
+            deadline = time.monotonic() + self.batch_window
+            while True:
+                self._take_matching(key, batch)
+                remaining = deadline - time.monotonic()
+                if len(batch) >= self.max_batch_size or remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            self._running_count += len(batch)
+            self._running_batches.append(batch)
+            for job in batch:
+                for waiting_job in job.with_followers():
+                    waiting_job.status = JOB_RUNNING
+                    waiting_job.started_at = time.time()
+                    waiting_job.notify_changed()
+            self._notify_pending()
+            return batch
+
+    def _worker_loop(self):
+        while True:
+            batch = self._next_batch()
+            filenames = [None] * len(batch)
+            error = None
+            started = time.monotonic()
+            try:
+                filenames = self.run_batch(batch)
+                if len(filenames) != len(batch):
+                    raise GenerationError("Image generation failed: No image output from model.")
+                if all(filenames):
+                    self._record_duration((time.monotonic() - started) / len(batch))
+            except Exception as e:
+                print(f"Generation batch of {len(batch)} job(s) failed: {e}")
+                filenames = [None] * len(batch)
+                error = str(e)
+            finally:
+                with self._cond:
+                    self._running_count -= len(batch)
+                    self._running_batches.remove(batch)
+                    # From here on, identical requests find the cached result or start a new job
+                    for job in batch:
+                        if job.dedup_key and self._in_flight.get(job.dedup_key) is job:
+                            del self._in_flight[job.dedup_key]
+                    for job, filename in zip(batch, filenames):
+                        for waiting_job in job.with_followers():
+                            if waiting_job.cancelled:
+                                continue  # already answered
+                            waiting_job.filename = filename
+                            waiting_job.error = error if filename is None else None
+                            if filename is None and not error:
+                                waiting_job.error = "Image generation failed: No image output from model."
+                            self._finish(waiting_job, JOB_SUCCEEDED if filename else JOB_FAILED)
+
+    def _record_duration(self, seconds_per_image):
+        if self.seconds_per_image is None:
+            self.seconds_per_image = seconds_per_image
+        else:
+            self.seconds_per_image += SECONDS_PER_IMAGE_SMOOTHING * (seconds_per_image - self.seconds_per_image)
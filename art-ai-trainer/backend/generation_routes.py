@@ -0,0 +1,148 @@
+import json
+
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from flask_login import login_required, current_user
+
+from extensions import db
+import inference_client
+from inference_client import InferenceUnavailableError
+from storage import upload_url, variant_urls
+
+
+generation_bp = Blueprint("generation", __name__)
+
+
+# Long-poll requests on the job status endpoint never hold a worker longer than this
+MAX_JOB_WAIT_SECONDS = 25
+
+# Request fields passed through to the inference server.
+# quality is "draft", "standard" or "final"; the same seed and prompt always give the same image.
+# priority is "interactive" (default) or "prefetch" for background generations nobody is waiting on yet.
+# timeout_seconds cancels the job if it hasn't finished by then (the server also caps it).
+GENERATION_OPTIONS = (
+    "negative_prompt", "seed", "quality", "num_inference_steps", "guidance_scale", "priority", "timeout_seconds"
+)
+
+
+def generation_job_response(job):
+    # Inference server job -> client payload, with the saved file turned into a public URL
+    response = {key: value for key, value in job.items() if key not in ("user_id", "filename")}
+    if job.get("filename"):
+        response["image_url"] = upload_url(job["filename"])
+        response["variants"] = variant_urls(job["filename"])
+    response["status_url"] = f"/api/generate_reference_image/{job['job_id']}"
+    response["events_url"] = f"/api/generate_reference_image/{job['job_id']}/events"
+    return response
+
+
+@generation_bp.route("/api/generate_reference_image", methods=["POST"])
+@login_required # Only logged-in users can use the generation feature
+def generate_reference_image():
+    data = request.json
+    prompt = data.get("prompt")
+
+    if not prompt or not prompt.strip():
+        return jsonify({"error": "Prompt cannot be empty for image generation."}), 400
+
+    # Optional settings (negative prompt, seed, quality tier, ...) are validated by the inference server
+    options = {name: data[name] for name in GENERATION_OPTIONS if data.get(name) is not None}
+
+    # Generation runs in the separate inference server process (inference_server.py)
+    try:
+        status_code, job = inference_client.submit_job(current_user.id, prompt, options)
+    except InferenceUnavailableError as e:
+        return jsonify({"error": str(e)}), 503
+    if status_code != 202:
+        return jsonify(job), status_code
+
+    print(f"API Request: queued generation job {job['job_id']} for prompt: '{prompt}'")
+    return jsonify(generation_job_response(job)), 202
+
+
+@generation_bp.route("/api/generate_reference_image/<job_id>", methods=["GET"])
+@login_required
+def get_generation_job(job_id):
+    # Optional long-poll: ?wait=<seconds> blocks until the job finishes or the wait expires
+    try:
+        wait = min(float(request.args.get("wait", 0)), MAX_JOB_WAIT_SECONDS)
+    except ValueError:
+        return jsonify({"error": "wait must be a number of seconds"}), 400
+
+    if wait > 0:
+        # Return the user lookup's database connection to the pool rather than hold it for the wait
+        db.session.close()
+    try:
+        status_code, job = inference_client.get_job(job_id, wait=max(wait, 0))
+    except InferenceUnavailableError as e:
+        return jsonify({"error": str(e)}), 503
+    if status_code != 200 or job.get("user_id") != current_user.id:
+        return jsonify({"error": "Generation job not found"}), 404
+
+    return jsonify(generation_job_response(job)), 200
+
+
+@generation_bp.route("/api/generate_reference_image/<job_id>", methods=["DELETE"])
+@login_required
+def cancel_generation_job(job_id):
+    # Stops the generation unless someone else asked for the identical image and is still waiting
+    try:
+        status_code, job = inference_client.get_job(job_id)
+        if status_code != 200 or job.get("user_id") != current_user.id:
+            return jsonify({"error": "Generation job not found"}), 404
+        status_code, job = inference_client.cancel_job(job_id)
+    except InferenceUnavailableError as e:
+        return jsonify({"error": str(e)}), 503
+    if status_code != 200:
+        return jsonify(job), status_code
+
+    return jsonify(generation_job_response(job)), 200
+
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@generation_bp.route("/api/generate_reference_image/<job_id>/events", methods=["GET"])
+@login_required
+def stream_generation_job(job_id):
+    # Server-Sent Events relayed from the inference server: "progress" events with the
+    # current step and a low-resolution preview, then one "done" event with the result.
+    try:
+        status_code, job = inference_client.get_job(job_id)
+    except InferenceUnavailableError as e:
+        return jsonify({"error": str(e)}), 503
+    if status_code != 200 or job.get("user_id") != current_user.id:
+        return jsonify({"error": "Generation job not found"}), 404
+    # The stream stays open for the whole generation; it doesn't need the database
+    db.session.close()
+
+    def events():
+        stream = inference_client.stream_job_events(job_id)
+        try:
+            for event, data in stream:
+                if event == "keepalive":
+                    yield ": keepalive\n\n"
+                else:
+                    yield format_sse(event, generation_job_response(data))
+        except InferenceUnavailableError as e:
+            yield format_sse("error", {"error": str(e)})
+        finally:
+            # If the browser went away, closing the upstream stream lets the inference server cancel the job
+            stream.close()
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        # Tell fronting proxies not to buffer the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@generation_bp.route("/api/generation_status", methods=["GET"])
+def generation_status():
+    # Readiness of the image generation model: not_loaded, loading, ready or failed
+    try:
+        _, status = inference_client.health()
+    except InferenceUnavailableError as e:
+        status = {"status": "unavailable", "error": str(e)}
+    return jsonify(status), 200 if status.get("status") == "ready" else 503
@@ -0,0 +1,152 @@
+"""Runs batches of generation settings through the diffusion pipeline of the current process.
+
+Used directly by inference_server.py, or inside each replica process of an
+inference_pool.InferencePool. Knows nothing about jobs or where images are
+stored: it takes a list of per-image settings and returns PIL images.
+"""
+import gc
+import os
+
+from embedding_cache import PromptEmbeddingCache
+from generation_queue import GenerationCancelled, GenerationError
+from latent_preview import latents_to_images, image_to_data_url
+from memory_profile import LOW_MEMORY_PROFILE, MemoryProfile, is_out_of_memory
+import diffusion_model
+
+
+# Latent previews are decoded every this many denoising steps (progress is reported every step)
+PREVIEW_EVERY_N_STEPS = int(os.environ.get("GENERATION_PREVIEW_EVERY_N_STEPS", 2))
+
+# Both set by configure_from_env()
+embedding_cache = None
+memory_profile = None
+
+
+def configure_from_env():
+    """Build the prompt-embedding cache and memory profile from the environment.
+
+    Runs at import; inference_pool replicas run it again (after
+    diffusion_model.configure_from_env(), whose weights_id() keys the cache)
+    once their own environment is in place.
+    """
+    global embedding_cache, memory_profile
+    # Text-encoder outputs are reused across requests; most share the default empty negative prompt
+    embedding_cache = PromptEmbeddingCache(
+        diffusion_model.weights_id(),
+        max_entries=int(os.environ.get("PROMPT_EMBEDDING_CACHE_SIZE", 256)),
+        persist_dir=os.environ.get("PROMPT_EMBEDDING_CACHE_DIR") or None
+    )
+    # Batches switch to sliced attention and VAE decoding when memory runs short; see memory_profile.py
+    memory_profile = MemoryProfile.from_env()
+
+
+configure_from_env()
+
+
+def stats():
+    return {
+        "prompt_embedding_cache": {"hits": embedding_cache.hits, "misses": embedding_cache.misses},
+        "memory_profile": memory_profile.describe(),
+    }
+
+
+def _run_pipeline(pipeline, batch, profile, on_progress, is_cancelled):
+    # All images share the same settings, so their prompts can go through the UNet together.
+    # The low-memory profile sends them through one at a time instead.
+    settings = batch[0]
+    memory_profile.apply(pipeline, profile)
+    chunk_size = 1 if profile == LOW_MEMORY_PROFILE else len(batch)
+
+    import torch
+
+    generated_images = []
+    for start in range(0, len(batch), chunk_size):
+        chunk = batch[start:start + chunk_size]
+        if all([is_cancelled(start + offset) for offset in range(len(chunk))]):
+            generated_images += [None] * len(chunk)
+            continue
+        prompts = [params["prompt"] for params in chunk]
+        # An empty negative prompt is exactly what the pipeline uses when none is given
+        negative_prompts = [params["negative_prompt"] for params in chunk]
+
+        def on_step_end(pipe, step, timestep, callback_kwargs, start=start, chunk=chunk):
+            # Called by the pipeline after every denoising step with the current latents
+            total_steps = getattr(pipe, "num_timesteps", None) or settings["num_inference_steps"]
+            previews = [None] * len(chunk)
+            if (step + 1) % PREVIEW_EVERY_N_STEPS == 0:
+                previews = [image_to_data_url(image) for image in latents_to_images(callback_kwargs["latents"])]
+            for offset, preview in enumerate(previews):
+                on_progress(start + offset, step + 1, total_steps, preview)
+            # Ask about every image (a list, not a short-circuiting generator) so each deadline is checked.
+            # Raising skips the remaining steps and the VAE decode, unlike the pipeline's own interrupt flag.
+            if all([is_cancelled(start + offset) for offset in range(len(chunk))]):
+                raise GenerationCancelled("Nobody is waiting for these images any more.")
+            return callback_kwargs
+
+        # One seeded generator per image makes each depend only on its own settings,
+        # not on what else happened to share the batch. CPU generators work on every device.
+        generators = [torch.Generator(device="cpu").manual_seed(params["seed"]) for params in chunk]
+        # Use torch.no_grad() for inference to save memory and speed up computation.
+        try:
+            with torch.no_grad(), diffusion_model.inference_context():
+                # Precomputed embeddings skip the text encoder for prompts seen before
+                prompt_embeds = embedding_cache.encode(pipeline, prompts)
+                negative_prompt_embeds = embedding_cache.encode(pipeline, negative_prompts)
+                generated_images += pipeline(
+                    prompt_embeds=prompt_embeds,
+                    negative_prompt_embeds=negative_prompt_embeds,
+                    generator=generators,
+                    num_inference_steps=settings["num_inference_steps"],
+                    guidance_scale=settings["guidance_scale"],
+                    width=settings["width"],
+                    height=settings["height"],
+                    callback_on_step_end=on_step_end,
+                    callback_on_step_end_tensor_inputs=["latents"]
+                ).images
+        except GenerationCancelled:
+            print(f"Stopped generating {len(chunk)} image(s) nobody is waiting for.")
+            generated_images += [None] * len(chunk)
+    return generated_images
+
+
+def generate_images(batch, on_progress, is_cancelled=lambda index: False):
+    """Generate one image per settings dict in `batch`, which must share their batch settings.
+
+    `on_progress(index, step, total_steps, preview)` is called after every
+    denoising step for each image. Once `is_cancelled(index)` is true for
+    every image in a pipeline call, the call stops at the next step and
+    those images come back as None. Raises GenerationError on failure.
+    """
+    settings = batch[0]
+    prompts = [params["prompt"] for params in batch]
+
+    # Loads the model on first use if the warm-up thread hasn't already
+    pipeline = diffusion_model.get_pipeline()
+    if pipeline is None:
+        raise GenerationError("Image generation service is unavailable (model failed to load).")
+
+    # Pick the profile from the memory free right now, before the OS has to OOM-kill us
+    profile = memory_profile.choose(len(batch))
+    try:
+        print(f"Generating {len(batch)} image(s) in one batch ({profile} memory profile) for prompts: {prompts}...")
+        diffusion_model.use_scheduler(pipeline, settings["scheduler"])
+        try:
+            generated_images = _run_pipeline(pipeline, batch, profile, on_progress, is_cancelled)
+        except Exception as e:
+            if profile == LOW_MEMORY_PROFILE or not is_out_of_memory(e):
+                raise
+            print(f"Out of memory with the {profile} profile; retrying with the low-memory profile.")
+            gc.collect()
+            profile = LOW_MEMORY_PROFILE
+            generated_images = _run_pipeline(pipeline, batch, profile, on_progress, is_cancelled)
+    except Exception as e:
+        if is_out_of_memory(e):
+            print(f"Image generation failed: out of memory ({e}).")
+            raise GenerationError("The server ran out of memory during generation. Please try again shortly.")
+        raise GenerationError(f"Image generation failed due to a server error: {str(e)}")
+    if profile == LOW_MEMORY_PROFILE:
+        memory_profile.low_memory_batches += 1
+
+    if len(generated_images) != len(batch):
+        raise GenerationError("Image generation failed: No image output from model.")
+    return generated_images
@@ -0,0 +1,17 @@
+"""Gunicorn settings for the web API, read automatically when gunicorn starts in this directory.
+
+    gunicorn 'app:create_app()'
+
+Generation progress streams and long-polls keep a request open for as long
+as a generation runs (up to GENERATION_JOB_TIMEOUT_SECONDS on the inference
+server). With gunicorn's default sync workers each of them would block a
+whole worker, and with it the feed and drawing routes, so workers run a
+pool of threads instead. Size GUNICORN_THREADS for the number of people
+expected to watch generations at once, plus headroom for ordinary requests.
+"""
+import os
+
+
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 32))
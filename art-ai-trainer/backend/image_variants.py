@@ -0,0 +1,106 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Widths the grids and feed pick from; an image is never scaled up
+VARIANT_WIDTHS = (160, 320, 640)
+
+VARIANTS_SUBFOLDER = "variants"
+
+
+def _variant_format():
+    # WebP is a fraction of the size of JPEG at the same quality, but Pillow can be built without it
+    from PIL import features
+    return ("webp", "WEBP") if features.check("webp") else ("jpg", "JPEG")
+
+
+class VariantGenerator:
+    """Writes downscaled copies of images in `folder` on a background thread pool.
+
+    The variants of foo.png are saved as variants/foo_<width>.<ext>. Since
+    source files are named by content, so are their variants, and a variant
+    that exists on disk is always complete and current.
+    """
+
+    def __init__(self, folder, widths=VARIANT_WIDTHS, workers=2):
+        self.folder = folder
+        self.widths = widths
+        self.variants_folder = os.path.join(folder, VARIANTS_SUBFOLDER)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-variants")
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._extension = None
+
+    @property
+    def extension(self):
+        if self._extension is None:
+            self._extension = _variant_format()[0]
+        return self._extension
+
+    def variant_filename(self, filename, width):
+        stem = os.path.splitext(filename)[0]
+        return f"{VARIANTS_SUBFOLDER}/{stem}_{width}.{self.extension}"
+
+    def existing_variants(self, filename):
+        """Map each width already generated for `filename` to its path relative to `folder`."""
+        variants = {}
+        for width in self.widths:
+            relative_path = self.variant_filename(filename, width)
+            if os.path.exists(os.path.join(self.folder, relative_path)):
+                variants[width] = relative_path
+        return variants
+
+    def submit(self, filename):
+        """Queue variant generation for a file in `folder`; returns immediately."""
+        with self._lock:
+            if filename in self._pending:
+                return
+            self._pending.add(filename)
+        self._executor.submit(self._generate, filename)
+
+    def remove(self, filename):
+        for width in self.widths:
+            try:
+                os.remove(os.path.join(self.folder, self.variant_filename(filename, width)))
+            except FileNotFoundError:
+                pass
+
+    def _generate(self, filename):
+        try:
+            self.write_variants(filename)
+        except Exception as e:
+            print(f"Could not create image variants for {filename}: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(filename)
+
+    def write_variants(self, filename):
+        """Create any missing variants of `filename` now, on the calling thread."""
+        from PIL import Image
+
+        missing = [
+            width for width in self.widths
+            if not os.path.exists(os.path.join(self.folder, self.variant_filename(filename, width)))
+        ]
+        if not missing:
+            return
+
+        extension, pil_format = _variant_format()
+        os.makedirs(self.variants_folder, exist_ok=True)
+        with Image.open(os.path.join(self.folder, filename)) as source:
+            # draft() lets JPEG decode straight at a reduced scale
+            source.draft("RGB", (max(missing), max(missing)))
+            image = source.convert("RGBA" if extension == "webp" and "A" in source.getbands() else "RGB")
+
+        for width in sorted(missing, reverse=True):
+            if width >= image.width:
+                # Smaller than the variant already; clients fall back to the original
+                continue
+            height = max(1, round(image.height * width / image.width))
+            # Each smaller width is resized from the previous result rather than the full-size original
+            image = image.resize((width, height), Image.LANCZOS)
+            path = os.path.join(self.folder, self.variant_filename(filename, width))
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            image.save(tmp_path, format=pil_format, quality=80)
+            os.replace(tmp_path, path)
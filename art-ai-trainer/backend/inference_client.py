@@ -0,0 +1,91 @@
+import json
+import os
+import urllib.error
+import urllib.parse
+import urllib.request
+
+
+# Where inference_server.py is listening
+INFERENCE_SERVER_URL = os.environ.get("INFERENCE_SERVER_URL", "http://127.0.0.1:5002")
+
+# Plain requests should answer quickly; long-polls add their wait on top of this
+REQUEST_TIMEOUT_SECONDS = 5
+
+# The server sends a keepalive at least every 15 seconds on event streams
+EVENT_STREAM_TIMEOUT_SECONDS = 45
+
+
+class InferenceUnavailableError(Exception):
+    """Raised when the inference server cannot be reached."""
+
+
+def _request(method, path, payload=None, timeout=REQUEST_TIMEOUT_SECONDS):
+    # Returns (status_code, json_body); HTTP error statuses are returned, not raised
+    body = json.dumps(payload).encode("utf-8") if payload is not None else None
+    req = urllib.request.Request(
+        INFERENCE_SERVER_URL + path,
+        data=body,
+        method=method,
+        headers={"Content-Type": "application/json"} if body is not None else {}
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as res:
+            return res.status, json.loads(res.read() or b"{}")
+    except urllib.error.HTTPError as e:
+        try:
+            return e.code, json.loads(e.read() or b"{}")
+        except ValueError:
+            return e.code, {"error": e.reason}
+    except (urllib.error.URLError, OSError) as e:
+        raise InferenceUnavailableError(f"Image generation service is unavailable: {e}")
+
+
+def health():
+    return _request("GET", "/health")
+
+
+def submit_job(user_id, prompt, options):
+    # options: negative_prompt, seed, quality and step/guidance overrides; validated by the server
+    return _request("POST", "/jobs", dict(options, user_id=user_id, prompt=prompt))
+
+
+def get_job(job_id, wait=0):
+    path = f"/jobs/{urllib.parse.quote(job_id)}"
+    if wait > 0:
+        path += f"?wait={wait}"
+    return _request("GET", path, timeout=REQUEST_TIMEOUT_SECONDS + wait)
+
+
+def cancel_job(job_id):
+    return _request("DELETE", f"/jobs/{urllib.parse.quote(job_id)}")
+
+
+def stream_job_events(job_id):
+    """Yield (event, data) pairs from the job's Server-Sent Events stream until it ends.
+
+    Keepalive comments are yielded as ("keepalive", None) so callers can pass them on.
+    """
+    url = f"{INFERENCE_SERVER_URL}/jobs/{urllib.parse.quote(job_id)}/events"
+    try:
+        res = urllib.request.urlopen(url, timeout=EVENT_STREAM_TIMEOUT_SECONDS)
+    except (urllib.error.URLError, OSError) as e:
+        raise InferenceUnavailableError(f"Image generation service is unavailable: {e}")
+
+    with res:
+        event, data_lines = "message", []
+        try:
+            for raw_line in res:
+                line = raw_line.decode("utf-8").rstrip("\r\n")
+                if not line:
+                    # A blank line ends the event
+                    if data_lines:
+                        yield event, json.loads("\n".join(data_lines))
+                    event, data_lines = "message", []
+                elif line.startswith(":"):
+                    yield "keepalive", None
+                elif line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data_lines.append(line[len("data:"):].strip())
+        except OSError as e:
+            raise InferenceUnavailableError(f"Lost connection to the image generation service: {e}")
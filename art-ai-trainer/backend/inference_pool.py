@@ -0,0 +1,225 @@
+"""Several copies of the diffusion pipeline in separate processes, each pinned to its own CPUs.
+
+One PyTorch process stops getting faster after a handful of intra-op
+threads, so on a large machine more images per minute come from several
+smaller replicas than from one big one. Each replica loads its own
+pipeline, restricted with sched_setaffinity to a disjoint slice of the
+CPUs this process may use, with one torch thread per CPU in its slice.
+
+The pool is driven by GenerationQueue worker threads (one per replica):
+run_batch() hands a batch to the least-loaded live replica and blocks
+until its images come back. Progress and previews are forwarded while it
+runs. A replica that dies is restarted for the next batch.
+"""
+import multiprocessing
+import os
+import threading
+
+from generation_queue import GenerationError
+
+
+def cpu_slices(replicas, threads_per_replica=None, cpus=None):
+    """Split the CPUs this process may run on into one list per replica."""
+    if cpus is None:
+        cpus = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else range(os.cpu_count() or 1)
+    cpus = sorted(cpus)
+    threads_per_replica = threads_per_replica or max(1, len(cpus) // replicas)
+    # With more threads requested than CPUs, slices wrap around and share CPUs
+    return [
+        [cpus[(i * threads_per_replica + j) % len(cpus)] for j in range(threads_per_replica)]
+        for i in range(replicas)
+    ]
+
+
+def _replica_main(conn, cpus, env):
+    # Entry point of a replica process. The environment and affinity must be in
+    # place before torch is imported, or its thread pools are sized for the whole machine.
+    os.environ.update(env)
+    if hasattr(os, "sched_setaffinity"):  # Linux only; elsewhere only the thread count applies
+        os.sched_setaffinity(0, cpus)
+
+    import torch
+    torch.set_num_threads(len(cpus))
+
+    import diffusion_model
+    import generation_runner
+
+    # spawn re-imported the parent's main module (inference_server) before this ran, which
+    # built these settings from the parent's environment; rebuild them from this replica's
+    diffusion_model.configure_from_env()
+    generation_runner.configure_from_env()
+
+    diffusion_model.get_pipeline()
+    conn.send(("status", diffusion_model.model_status()))
+
+    while True:
+        try:
+            batch = conn.recv()
+        except EOFError:
+            break
+        if batch is None:
+            break
+        if isinstance(batch, tuple):
+            continue  # a cancellation that arrived after its batch finished
+        cancelled = set()
+
+        def on_progress(index, step, total_steps, preview):
+            conn.send(("progress", index, step, total_steps, preview))
+
+        def is_cancelled(index):
+            # The parent sends ("cancel", indexes) in reply to progress messages
+            while conn.poll():
+                message = conn.recv()
+                cancelled.clear()
+                cancelled.update(message[1])
+            return index in cancelled
+
+        try:
+            images = generation_runner.generate_images(batch, on_progress, is_cancelled)
+            conn.send(("done", images, generation_runner.stats()))
+        except GenerationError as e:
+            conn.send(("error", str(e), generation_runner.stats()))
+
+
+class Replica:
+    def __init__(self, index, cpus, env, context):
+        self.index = index
+        self.cpus = cpus
+        self.env = env
+        self._context = context
+        self.in_flight = 0     # images handed to this replica and not yet returned
+        self.completed = 0
+        self.model_status = {"status": "not_loaded"}
+        self.stats = {}
+        self.process = None
+        self._conn = None
+        self._lock = threading.Lock()  # one batch at a time per replica
+        self._loaded = threading.Event()
+
+    def start(self):
+        parent_conn, child_conn = self._context.Pipe()
+        self.process = self._context.Process(
+            target=_replica_main,
+            args=(child_conn, self.cpus, self.env),
+            name=f"inference-replica-{self.index}",
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self._conn = parent_conn
+        self.model_status = {"status": "loading"}
+        self._loaded.clear()
+        threading.Thread(target=self._wait_until_loaded, name=f"inference-replica-{self.index}-load",
+                         daemon=True).start()
+
+    def _wait_until_loaded(self):
+        # The replica reports its model status once, right after loading
+        try:
+            self.model_status = self._conn.recv()[1]
+        except (EOFError, OSError):
+            self.model_status = {"status": "failed", "error": "The replica exited while loading the model."}
+        finally:
+            self._loaded.set()
+
+    def is_failed(self):
+        return self.model_status.get("status") == "failed"
+
+    def run(self, batch, on_progress, is_cancelled):
+        with self._lock:
+            if self.process is None or not self.process.is_alive():
+                print(f"Starting inference replica {self.index} on CPUs {self.cpus}")
+                self.start()
+            self._loaded.wait()
+            if self.is_failed():
+                raise GenerationError("Image generation service is unavailable (model failed to load).")
+            try:
+                self._conn.send(batch)
+                cancelled = set()
+                while True:
+                    message = self._conn.recv()
+                    if message[0] == "progress":
+                        on_progress(*message[1:])
+                        # Checked once per step, so a cancelled batch stops within one more
+                        now_cancelled = {i for i in range(len(batch)) if is_cancelled(i)}
+                        if now_cancelled != cancelled:
+                            cancelled = now_cancelled
+                            self._conn.send(("cancel", sorted(cancelled)))
+                        continue
+                    self.stats = message[2]
+                    if message[0] == "error":
+                        raise GenerationError(message[1])
+                    self.completed += len(batch)
+                    return message[1]
+            except (EOFError, OSError) as e:
+                # The replica died mid-batch (e.g. OOM-killed); it is restarted for the next one
+                print(f"Inference replica {self.index} exited during a batch: {e}")
+                self.process.join(timeout=5)
+                self.process = None
+                raise GenerationError("Image generation failed due to a server error. Please try again.")
+
+    def describe(self):
+        return {
+            "replica": self.index,
+            "cpus": self.cpus,
+            "status": self.model_status.get("status"),
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            **self.stats,
+        }
+
+
+class InferencePool:
+    def __init__(self, replicas, threads_per_replica=None, cpus=None):
+        context = multiprocessing.get_context("spawn")
+        slices = cpu_slices(replicas, threads_per_replica, cpus)
+        env = {}
+        budget_mb = os.environ.get("GENERATION_MEMORY_BUDGET_MB")
+        if budget_mb:
+            # Each replica checks the budget against its own memory use
+            env["GENERATION_MEMORY_BUDGET_MB"] = str(int(budget_mb) // replicas)
+        self.replicas = [
+            Replica(i, cpus, dict(env, TORCH_NUM_THREADS=str(len(cpus)), OMP_NUM_THREADS=str(len(cpus))), context)
+            for i, cpus in enumerate(slices)
+        ]
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start every replica; each loads its pipeline in the background."""
+        for replica in self.replicas:
+            replica.start()
+
+    def wait_until_loaded(self):
+        for replica in self.replicas:
+            replica._loaded.wait()
+
+    def stop(self):
+        for replica in self.replicas:
+            if replica.process is not None:
+                replica.process.terminate()
+                replica.process.join()
+                replica.process = None
+
+    def model_status(self):
+        statuses = [replica.model_status.get("status") for replica in self.replicas]
+        if "ready" in statuses:
+            status = "ready"
+        elif all(s == "failed" for s in statuses):
+            status = "failed"
+        else:
+            status = "loading"
+        return {"status": status, "replicas": [replica.describe() for replica in self.replicas]}
+
+    def is_failed(self):
+        return all(replica.is_failed() for replica in self.replicas)
+
+    def run_batch(self, batch, on_progress, is_cancelled=lambda index: False):
+        """Generate `batch` on the least-loaded replica; same contract as generation_runner.generate_images."""
+        with self._lock:
+            candidates = [r for r in self.replicas if not r.is_failed()] or self.replicas
+            replica = min(candidates, key=lambda r: (r.in_flight, r.completed))
+            replica.in_flight += len(batch)
+        try:
+            return replica.run(batch, on_progress, is_cancelled)
+        finally:
+            with self._lock:
+                replica.in_flight -= len(batch)
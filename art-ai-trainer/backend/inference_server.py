@@ -0,0 +1,308 @@
+"""Long-lived inference process that owns the Stable Diffusion pipeline.
+
+The web app (app.py) talks to this server over local HTTP through
+inference_client.py, so any number of web workers share one copy of the
+model weights (or, with INFERENCE_REPLICAS, a fixed number of copies in
+worker processes). Run exactly one process of it, e.g.:
+
+    python inference_server.py
+"""
+from flask import Flask, Response, request, jsonify
+import json
+import math
+import os
+import threading
+import time
+from generation_queue import GenerationQueue, QueueFullError, PRIORITIES, PRIORITY_INTERACTIVE
+from result_cache import ResultCache, cache_key
+from image_variants import VariantGenerator
+from inference_pool import InferencePool
+import diffusion_model
+import generation_runner
+
+
+INFERENCE_HOST = os.environ.get("INFERENCE_SERVER_HOST", "127.0.0.1")
+INFERENCE_PORT = int(os.environ.get("INFERENCE_SERVER_PORT", 5002))
+
+# Generated images are written where the web app serves uploads from
+UPLOAD_FOLDER = os.environ.get("UPLOAD_FOLDER", "static/uploads")
+
+# Quality tiers map to a scheduler and step count. Every job carries its resolved
+# settings so the queue can batch compatible jobs.
+QUALITY_TIERS = {
+    # DPM-Solver++ converges in far fewer steps; good enough for quick sketch references
+    "draft": {"scheduler": "dpmsolver++", "num_inference_steps": 12, "guidance_scale": 7.0},
+    # The pipeline's default scheduler at the original 30 steps
+    "standard": {"scheduler": "pndm", "num_inference_steps": 30, "guidance_scale": 7.5},
+    "final": {"scheduler": "dpmsolver++", "num_inference_steps": 40, "guidance_scale": 7.5},
+}
+DEFAULT_QUALITY = "standard"
+
+# Per-request overrides are clamped to these limits
+MAX_INFERENCE_STEPS = int(os.environ.get("GENERATION_MAX_STEPS", 50))
+MIN_GUIDANCE_SCALE = 1.0
+MAX_GUIDANCE_SCALE = 15.0
+
+IMAGE_WIDTH = 512
+IMAGE_HEIGHT = 512
+
+# Requests without a seed use this one, so repeated prompts produce (and cache) the same image
+DEFAULT_SEED = 0
+MAX_SEED = 2**32 - 1
+
+# Downscaled copies of each generated image for grids and the feed, made off the request path
+image_variants = VariantGenerator(UPLOAD_FOLDER, workers=int(os.environ.get("IMAGE_VARIANT_WORKERS", 2)))
+
+# Generated images are cached on disk by their settings, bounded by total size
+result_cache = ResultCache(
+    UPLOAD_FOLDER,
+    max_bytes=int(os.environ.get("GENERATION_CACHE_MAX_MB", 512)) * 1024 * 1024,
+    on_evict=image_variants.remove
+)
+
+# INFERENCE_REPLICAS > 1 runs that many pipelines in worker processes, each pinned to
+# INFERENCE_THREADS_PER_REPLICA CPUs (default: an equal share); see inference_pool.py
+INFERENCE_REPLICAS = int(os.environ.get("INFERENCE_REPLICAS", 1))
+inference_pool = None
+if INFERENCE_REPLICAS > 1:
+    inference_pool = InferencePool(
+        INFERENCE_REPLICAS,
+        threads_per_replica=int(os.environ.get("INFERENCE_THREADS_PER_REPLICA", 0)) or None
+    )
+
+# Jobs not finished this long after they were submitted are cancelled; requests may ask for less
+JOB_TIMEOUT_SECONDS = float(os.environ.get("GENERATION_JOB_TIMEOUT_SECONDS", 600))
+
+# Long-poll requests on the job status endpoint never hold a thread longer than this
+MAX_JOB_WAIT_SECONDS = 25
+
+# Idle event streams send a comment this often so proxies don't close them
+EVENT_STREAM_KEEPALIVE_SECONDS = 15
+
+# A job whose event stream disconnects is cancelled unless a client asks about it (a status
+# poll or a new stream, as the web client falls back to) within this many seconds
+DISCONNECT_GRACE_SECONDS = float(os.environ.get("GENERATION_DISCONNECT_GRACE_SECONDS", 10))
+
+
+def run_generation_batch(jobs):
+    # Runs on a generation worker thread, never inside a request
+    def on_progress(index, step, total_steps, preview):
+        jobs[index].update_progress(step, total_steps, preview)
+
+    def is_cancelled(index):
+        # Cancelled, or past its deadline, with no identical request still waiting for it
+        return generation_queue.should_stop(jobs, index)
+
+    batch = [job.params for job in jobs]
+    if inference_pool:
+        generated_images = inference_pool.run_batch(batch, on_progress, is_cancelled)
+    else:
+        generated_images = generation_runner.generate_images(batch, on_progress, is_cancelled)
+
+    filenames = []
+    for job, image in zip(jobs, generated_images):
+        if image is None:
+            # Stopped early because nobody wanted it any more
+            filenames.append(None)
+            continue
+        # Results are saved under their cache key, so identical requests share one file
+        filename = result_cache.store(job.params["cache_key"], image)
+        image_variants.submit(filename)
+        print(f"Image generated and saved: {filename}")
+        filenames.append(filename)
+    return filenames
+
+
+generation_queue = GenerationQueue(
+    run_generation_batch,
+    maxsize=int(os.environ.get("GENERATION_QUEUE_SIZE", 16)),
+    max_batch_size=int(os.environ.get("GENERATION_MAX_BATCH_SIZE", 4)),
+    batch_window=float(os.environ.get("GENERATION_BATCH_WINDOW_SECONDS", 0.25)),
+    workers=INFERENCE_REPLICAS,
+    max_pending_per_user=int(os.environ.get("GENERATION_MAX_PENDING_PER_USER", 4))
+)
+
+app = Flask(__name__)
+
+
+@app.route("/health", methods=["GET"])
+def health():
+    # Readiness of the image generation model: not_loaded, loading, ready or failed
+    if inference_pool:
+        # Ready as soon as one replica is; per-replica status and cache stats are listed
+        status = dict(inference_pool.model_status(), model_id=diffusion_model.MODEL_ID)
+    else:
+        status = dict(diffusion_model.model_status(), **generation_runner.stats())
+    status["queued_jobs"] = generation_queue.pending_count()
+    status["coalesced_jobs"] = generation_queue.coalesced_count
+    status["seconds_per_image"] = generation_queue.seconds_per_image
+    return jsonify(status), 200
+
+
+def finite_number(value, convert=float):
+    """convert(value), rejecting NaN and infinity: NaN would slip through min()/max() clamping."""
+    if not math.isfinite(float(value)):
+        raise ValueError(f"{value!r} is not a finite number")
+    return convert(value)
+
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    # Fail fast if the model could not be loaded; otherwise the worker loads it on demand
+    if inference_pool.is_failed() if inference_pool else diffusion_model.is_failed():
+        return jsonify({"error": "Image generation service is unavailable (model failed to load)."}), 503
+
+    data = request.json or {}
+    prompt = (data.get("prompt") or "").strip()
+    negative_prompt = (data.get("negative_prompt") or "").strip()
+    user_id = data.get("user_id")
+    seed = data.get("seed")
+    quality = data.get("quality") or DEFAULT_QUALITY
+    # "prefetch" is for speculative background generations; they only run when nobody is waiting
+    priority = data.get("priority") or PRIORITY_INTERACTIVE
+
+    if not prompt:
+        return jsonify({"error": "Prompt cannot be empty for image generation."}), 400
+    if seed is None:
+        seed = DEFAULT_SEED
+    elif not isinstance(seed, int) or isinstance(seed, bool) or not 0 <= seed <= MAX_SEED:
+        return jsonify({"error": f"seed must be an integer between 0 and {MAX_SEED}."}), 400
+    if quality not in QUALITY_TIERS:
+        return jsonify({"error": f"quality must be one of: {', '.join(QUALITY_TIERS)}."}), 400
+    if priority not in PRIORITIES:
+        return jsonify({"error": f"priority must be one of: {', '.join(PRIORITIES)}."}), 400
+    # e.g. the client's own HTTP timeout, so nothing is generated after it has given up
+    timeout = JOB_TIMEOUT_SECONDS
+    if data.get("timeout_seconds") is not None:
+        try:
+            timeout = finite_number(data["timeout_seconds"])
+        except (TypeError, ValueError):
+            timeout = None
+        if timeout is None or timeout <= 0:
+            return jsonify({"error": "timeout_seconds must be a positive number."}), 400
+        timeout = min(timeout, JOB_TIMEOUT_SECONDS)
+
+    params = dict(
+        QUALITY_TIERS[quality],
+        prompt=prompt,
+        negative_prompt=negative_prompt,
+        seed=seed,
+        quality=quality,
+        width=IMAGE_WIDTH,
+        height=IMAGE_HEIGHT
+    )
+
+    # Optional overrides of the tier's steps and guidance, capped to what the server allows
+    try:
+        if data.get("num_inference_steps") is not None:
+            params["num_inference_steps"] = min(max(finite_number(data["num_inference_steps"], int), 1), MAX_INFERENCE_STEPS)
+        if data.get("guidance_scale") is not None:
+            params["guidance_scale"] = min(max(finite_number(data["guidance_scale"]), MIN_GUIDANCE_SCALE), MAX_GUIDANCE_SCALE)
+    except (TypeError, ValueError):
+        return jsonify({"error": "num_inference_steps and guidance_scale must be finite numbers."}), 400
+
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+    params["cache_key"] = cache_key(params, diffusion_model.weights_id())
+
+    # Identical settings already generated: answer with the stored image right away
+    cached_filename = result_cache.lookup(params["cache_key"])
+    if cached_filename:
+        # No-op when the variants exist; recreates them for images cached before they did
+        image_variants.submit(cached_filename)
+        job = generation_queue.add_finished(user_id, params, cached_filename)
+        print(f"Cache hit for prompt: '{prompt}' -> {cached_filename}")
+        return jsonify(generation_queue.describe(job)), 202
+
+    try:
+        # Identical settings already queued or running: the new job shares that run's result
+        job = generation_queue.submit(user_id, params, dedup_key=params["cache_key"], priority=priority,
+                                      deadline=time.time() + timeout)
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 429
+
+    print(f"Queued generation job {job.id} for prompt: '{prompt}'")
+    return jsonify(generation_queue.describe(job)), 202
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = generation_queue.get(job_id)
+    if not job:
+        return jsonify({"error": "Generation job not found"}), 404
+    job.last_seen = time.time()
+
+    # Optional long-poll: ?wait=<seconds> blocks until the job finishes or the wait expires
+    try:
+        wait = min(float(request.args.get("wait", 0)), MAX_JOB_WAIT_SECONDS)
+    except ValueError:
+        return jsonify({"error": "wait must be a number of seconds"}), 400
+    if wait > 0:
+        job.done.wait(wait)
+        job.last_seen = time.time()
+
+    return jsonify(generation_queue.describe(job)), 200
+
+
+@app.route("/jobs/<job_id>", methods=["DELETE"])
+def cancel_job(job_id):
+    job = generation_queue.get(job_id)
+    if not job:
+        return jsonify({"error": "Generation job not found"}), 404
+    # Finished jobs are left as they are; either way the job's current state is returned
+    generation_queue.cancel(job)
+    return jsonify(generation_queue.describe(job)), 200
+
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.route("/jobs/<job_id>/events", methods=["GET"])
+def stream_job_events(job_id):
+    # Server-Sent Events: "progress" events with step counts and latent previews,
+    # then a single "done" event carrying the finished job.
+    job = generation_queue.get(job_id)
+    if not job:
+        return jsonify({"error": "Generation job not found"}), 404
+
+    def events():
+        version = None
+        sent_preview = None
+        try:
+            while not job.done.is_set():
+                job.last_seen = time.time()
+                if job.version != version:
+                    version = job.version
+                    data = generation_queue.describe(job)
+                    # Previews are large; only send one when it changed
+                    if job.preview is not sent_preview:
+                        data["preview"] = sent_preview = job.preview
+                    yield format_sse("progress", data)
+                else:
+                    yield ": keepalive\n\n"
+                job.wait_for_change(version, EVENT_STREAM_KEEPALIVE_SECONDS)
+            yield format_sse("done", generation_queue.describe(job))
+        finally:
+            # The client went away (the server closes the stream when a write fails). It may only
+            # have lost the connection and come back polling, so give it a moment before deciding
+            # nobody is waiting; an identical request following this job keeps the run going anyway.
+            if not job.done.is_set():
+                timer = threading.Timer(
+                    DISCONNECT_GRACE_SECONDS, generation_queue.cancel_unless_seen,
+                    args=(job, time.time(), "The client disconnected.")
+                )
+                timer.daemon = True
+                timer.start()
+
+    return Response(events(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+if __name__ == "__main__":
+    # Start loading the model right away; the HTTP interface answers /health while it loads
+    if inference_pool:
+        inference_pool.start()
+    else:
+        diffusion_model.start_warmup()
+    # A single process must own the model (or its replicas), so use threads (not the reloader or multiple workers)
+    app.run(host=INFERENCE_HOST, port=INFERENCE_PORT, threaded=True, use_reloader=False)
@@ -0,0 +1,95 @@
+import collections
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+
+from flask import abort, current_app, request, send_file
+from werkzeug.security import safe_join
+
+
+# Names of files whose bytes never change: blob store uploads and their variants. Cached
+# generations (generated_ref_<key>) are not among them: the key hashes the settings, and an
+# image regenerated after eviction can differ slightly (batching, device, dtype).
+IMMUTABLE_FILENAME_RE = re.compile(r"^[0-9a-f]{64}(?:_\d+)?\.(?:png|jpg|gif|webp)$")
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# How served files are handed over (MEDIA_SENDFILE_MODE): "" streams them from Python;
+# "x-sendfile" (Apache, lighttpd) and "x-accel-redirect" (nginx) only send headers and
+# let the proxy read the file itself
+MEDIA_SENDFILE_MODES = ("", "x-sendfile", "x-accel-redirect")
+
+# Content hashes of files with mutable names, keyed by (path, mtime, size)
+_digest_cache = collections.OrderedDict()
+_digest_cache_lock = threading.Lock()
+DIGEST_CACHE_SIZE = 1024
+
+
+def _file_digest(path, stat):
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _digest_cache_lock:
+        digest = _digest_cache.get(key)
+        if digest is not None:
+            _digest_cache.move_to_end(key)
+            return digest
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+    with _digest_cache_lock:
+        _digest_cache[key] = digest
+        while len(_digest_cache) > DIGEST_CACHE_SIZE:
+            _digest_cache.popitem(last=False)
+    return digest
+
+
+def send_media(folder, filename, as_attachment=False):
+    """Serve a file from `folder` with a strong ETag, conditional GET and Range support.
+
+    Content-addressed names are cached by browsers and proxies for a year
+    without revalidating; anything else must be revalidated, which is cheap
+    thanks to the ETag. With MEDIA_SENDFILE_MODE set, the fronting proxy
+    sends the bytes instead of a Python worker.
+    """
+    path = safe_join(os.path.abspath(folder), filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    stat = os.stat(path)
+
+    if IMMUTABLE_FILENAME_RE.match(os.path.basename(filename)):
+        # The name already is a hash of the content (or, for variants, of what it was derived from)
+        etag = os.path.splitext(os.path.basename(filename))[0]
+        cache_control = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    else:
+        etag = _file_digest(path, stat)
+        cache_control = "public, no-cache"
+
+    if current_app.config.get("MEDIA_SENDFILE_MODE") == "x-accel-redirect":
+        response = _accel_redirect_response(path, etag, as_attachment)
+    else:
+        # send_file answers If-None-Match with 304 and Range requests with 206 itself.
+        # In x-sendfile mode the app sets USE_X_SENDFILE, so it sends an X-Sendfile header instead of the body.
+        response = send_file(path, as_attachment=as_attachment, conditional=True, etag=etag,
+                             last_modified=stat.st_mtime)
+
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+def _accel_redirect_response(path, etag, as_attachment):
+    # nginx serves the file (Range requests included) from an internal location whose
+    # alias is MEDIA_ROOT, e.g. `location /_media/ { internal; alias /srv/backend/static/; }`
+    response = current_app.response_class(status=200)
+    response.set_etag(etag)
+    response.mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if as_attachment:
+        response.headers["Content-Disposition"] = f"attachment; filename={os.path.basename(path)}"
+    response.make_conditional(request)
+    if response.status_code == 200:
+        prefix = current_app.config.get("MEDIA_ACCEL_REDIRECT_PREFIX", "/_media/").rstrip("/")
+        media_root = os.path.abspath(current_app.config.get("MEDIA_ROOT", "static"))
+        response.headers["X-Accel-Redirect"] = f"{prefix}/{os.path.relpath(path, media_root)}"
+    return response
@@ -0,0 +1,16 @@
+from flask import Blueprint, current_app
+
+from media import send_media
+
+
+media_bp = Blueprint("media", __name__)
+
+
+@media_bp.route('/static/<path:filename>', methods=['GET'])
+def serve_static(filename):
+    return send_media(current_app.config['MEDIA_ROOT'], filename)
+
+@media_bp.route('/download/uploads/<filename>', methods=['GET'])
+def download_uploaded_file(filename):
+
+    return send_media(current_app.config['UPLOAD_FOLDER'], filename, as_attachment=True)
@@ -0,0 +1,158 @@
+"""Picks how memory-hungry each generation batch may be, from the memory actually available.
+
+GENERATION_MEMORY_PROFILE is "auto" (default), "standard" or "low". The low
+profile slices attention, decodes the VAE one image at a time in tiles and
+runs the UNet on one image at a time instead of the whole batch; it is
+slower but needs a fraction of the working memory. "auto" uses it for a
+batch whenever the standard profile's estimated need doesn't fit in the
+smallest of:
+
+    - MemAvailable in /proc/meminfo
+    - the cgroup's memory limit minus its current (non-reclaimable) usage
+    - GENERATION_MEMORY_BUDGET_MB minus this process's resident memory, if set
+"""
+import os
+
+
+STANDARD_PROFILE = "standard"
+LOW_MEMORY_PROFILE = "low"
+PROFILE_MODES = ("auto", STANDARD_PROFILE, LOW_MEMORY_PROFILE)
+
+# Rough working memory of one float32 512x512 image on top of the loaded weights, with
+# classifier-free guidance doubling the UNet batch. Override with GENERATION_MEMORY_PER_IMAGE_MB.
+DEFAULT_PER_IMAGE_MB = 1536
+
+# cgroup v1 reports "no limit" as a huge number rather than "max"
+CGROUP_V1_UNLIMITED = 1 << 60
+
+CGROUP_V2_DIR = "/sys/fs/cgroup"
+CGROUP_V1_DIR = "/sys/fs/cgroup/memory"
+
+
+def _read_int(path):
+    try:
+        with open(path) as f:
+            value = f.read().strip()
+    except OSError:
+        return None
+    return None if value == "max" else int(value)
+
+
+def _read_stat(path, name):
+    try:
+        with open(path) as f:
+            for line in f:
+                key, _, value = line.partition(" ")
+                if key == name:
+                    return int(value)
+    except OSError:
+        pass
+    return 0
+
+
+def cgroup_free_bytes():
+    """Room left under this cgroup's memory limit, or None without one."""
+    if os.path.exists(os.path.join(CGROUP_V2_DIR, "memory.max")):
+        limit = _read_int(os.path.join(CGROUP_V2_DIR, "memory.max"))
+        usage = _read_int(os.path.join(CGROUP_V2_DIR, "memory.current"))
+        inactive_file = _read_stat(os.path.join(CGROUP_V2_DIR, "memory.stat"), "inactive_file")
+    else:
+        limit = _read_int(os.path.join(CGROUP_V1_DIR, "memory.limit_in_bytes"))
+        usage = _read_int(os.path.join(CGROUP_V1_DIR, "memory.usage_in_bytes"))
+        inactive_file = _read_stat(os.path.join(CGROUP_V1_DIR, "memory.stat"), "total_inactive_file")
+        if limit is not None and limit >= CGROUP_V1_UNLIMITED:
+            limit = None
+    if limit is None or usage is None:
+        return None
+    # Inactive page cache is reclaimed before the OOM killer steps in
+    return limit - max(usage - inactive_file, 0)
+
+
+def meminfo_available_bytes():
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def process_rss_bytes():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def is_out_of_memory(error):
+    # CPU allocation failures surface as RuntimeError from torch's allocator, or as MemoryError
+    if isinstance(error, MemoryError):
+        return True
+    message = str(error).lower()
+    return isinstance(error, RuntimeError) and ("out of memory" in message or "can't allocate memory" in message)
+
+
+class MemoryProfile:
+    """Chooses and applies the standard or low-memory profile for each batch."""
+
+    def __init__(self, mode="auto", budget_bytes=None, per_image_bytes=DEFAULT_PER_IMAGE_MB * 1024 * 1024):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"GENERATION_MEMORY_PROFILE must be one of {PROFILE_MODES}")
+        self.mode = mode
+        self.budget_bytes = budget_bytes
+        self.per_image_bytes = per_image_bytes
+        self.current = None
+        self.low_memory_batches = 0
+
+    @classmethod
+    def from_env(cls):
+        budget_mb = os.environ.get("GENERATION_MEMORY_BUDGET_MB")
+        return cls(
+            mode=os.environ.get("GENERATION_MEMORY_PROFILE", "auto"),
+            budget_bytes=int(budget_mb) * 1024 * 1024 if budget_mb else None,
+            per_image_bytes=int(os.environ.get("GENERATION_MEMORY_PER_IMAGE_MB", DEFAULT_PER_IMAGE_MB)) * 1024 * 1024,
+        )
+
+    def available_bytes(self):
+        candidates = [meminfo_available_bytes(), cgroup_free_bytes()]
+        if self.budget_bytes:
+            candidates.append(self.budget_bytes - process_rss_bytes())
+        candidates = [c for c in candidates if c is not None]
+        return min(candidates) if candidates else None
+
+    def choose(self, batch_size):
+        if self.mode != "auto":
+            return self.mode
+        available = self.available_bytes()
+        if available is None or available >= self.per_image_bytes * batch_size:
+            return STANDARD_PROFILE
+        return LOW_MEMORY_PROFILE
+
+    def apply(self, pipeline, profile):
+        """Switch the pipeline's attention and VAE settings to `profile`. Only call from the generation thread."""
+        if profile == self.current:
+            return
+        if profile == LOW_MEMORY_PROFILE:
+            pipeline.enable_attention_slicing()
+            pipeline.vae.enable_slicing()
+            pipeline.vae.enable_tiling()
+        else:
+            pipeline.disable_attention_slicing()
+            pipeline.vae.disable_slicing()
+            pipeline.vae.disable_tiling()
+        self.current = profile
+
+    def describe(self):
+        available = self.available_bytes()
+        return {
+            "mode": self.mode,
+            "current": self.current,
+            "available_mb": available // (1024 * 1024) if available is not None else None,
+            "low_memory_batches": self.low_memory_batches,
+        }
@@ -0,0 +1,29 @@
+"""drawing images referenced by blob store filename
+
+Revision ID: 3f9a60d2c7e4
+Revises: b7e24f5a13c8
+Create Date: 2026-10-18 14:21:36.590417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a60d2c7e4'
+down_revision = 'b7e24f5a13c8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing data URLs are kept as they are; `flask move-drawings-to-blob-store` writes them out
+    with op.batch_alter_table('drawing', schema=None) as batch_op:
+        batch_op.alter_column('image_url', new_column_name='image_key',
+               existing_type=sa.String(length=300), existing_nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('drawing', schema=None) as batch_op:
+        batch_op.alter_column('image_key', new_column_name='image_url',
+               existing_type=sa.String(length=300), existing_nullable=False)
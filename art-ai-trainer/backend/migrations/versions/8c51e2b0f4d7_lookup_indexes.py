@@ -0,0 +1,30 @@
+"""indexes for per-user, per-post and feed lookups
+
+Revision ID: 8c51e2b0f4d7
+Revises: 3f9a60d2c7e4
+Create Date: 2026-10-18 18:03:12.774920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c51e2b0f4d7'
+down_revision = '3f9a60d2c7e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_drawing_user_id', 'drawing', ['user_id'], unique=False)
+    op.create_index('ix_community_post_created_at_id', 'community_post', ['created_at', 'id'], unique=False)
+    op.create_index('ix_like_post_id', 'like', ['post_id'], unique=False)
+    op.create_index('ix_comment_post_id_created_at', 'comment', ['post_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_comment_post_id_created_at', table_name='comment')
+    op.drop_index('ix_like_post_id', table_name='like')
+    op.drop_index('ix_community_post_created_at_id', table_name='community_post')
+    op.drop_index('ix_drawing_user_id', table_name='drawing')
@@ -0,0 +1,51 @@
+"""denormalized like/comment counters on community_post
+
+Revision ID: b7e24f5a13c8
+Revises: 6a1d3c0e9b21
+Create Date: 2026-10-18 11:40:57.118032
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e24f5a13c8'
+down_revision = '6a1d3c0e9b21'
+branch_labels = None
+depends_on = None
+
+
+community_post = sa.table('community_post',
+    sa.column('id', sa.Integer),
+    sa.column('like_count', sa.Integer),
+    sa.column('comment_count', sa.Integer)
+)
+like = sa.table('like', sa.column('id', sa.Integer), sa.column('post_id', sa.Integer))
+comment = sa.table('comment', sa.column('id', sa.Integer), sa.column('post_id', sa.Integer))
+
+
+def upgrade():
+    with op.batch_alter_table('community_post', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('like_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.create_index('ix_community_post_like_count_id', ['like_count', 'id'], unique=False)
+
+    # Backfill the counters from the existing likes and comments
+    op.execute(
+        community_post.update().values(
+            like_count=sa.select(sa.func.count(like.c.id))
+                .where(like.c.post_id == community_post.c.id)
+                .scalar_subquery(),
+            comment_count=sa.select(sa.func.count(comment.c.id))
+                .where(comment.c.post_id == community_post.c.id)
+                .scalar_subquery()
+        )
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('community_post', schema=None) as batch_op:
+        batch_op.drop_index('ix_community_post_like_count_id')
+        batch_op.drop_column('comment_count')
+        batch_op.drop_column('like_count')
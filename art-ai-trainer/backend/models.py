@@ -0,0 +1,218 @@
+from datetime import datetime
+
+from flask_login import UserMixin
+from sqlalchemy import func, or_, event
+from sqlalchemy.orm import joinedload
+
+from extensions import db, login_manager
+from storage import upload_url, uploaded_filename, variant_urls
+
+
+class User(db.Model, UserMixin):
+    __tablename__ = "user"
+    id = db.Column(db.Integer, primary_key=True)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    password = db.Column(db.String(200), nullable=False)
+    username = db.Column(db.String(80), unique=True, nullable=True) # Ensure this field is present
+    drawings = db.relationship('Drawing', backref='owner', lazy=True)
+    community_posts = db.relationship('CommunityPost', backref='poster', lazy=True)
+    likes = db.relationship('Like', backref='liker', lazy=True)
+    comments = db.relationship('Comment', backref='commenter', lazy=True)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "email": self.email,
+            "username": self.username
+        }
+
+class Drawing(db.Model):
+    __tablename__ = "drawing"
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(150), nullable=False)
+    # Blob store filename; rows saved before the blob store may still hold a data URL
+    image_key = db.Column(db.String(300), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user = db.relationship('User')
+
+    __table_args__ = (db.Index('ix_drawing_user_id', 'user_id'),)
+
+    @property
+    def image_url(self):
+        if self.image_key.startswith("data:"):
+            return self.image_key
+        return upload_url(self.image_key)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "image_url": self.image_url,
+            "variants": variant_urls(None if self.image_key.startswith("data:") else self.image_key),
+            'user_id': self.user_id
+        }
+
+class CommunityPost(db.Model):
+    __tablename__ = "community_post"
+    id = db.Column(db.Integer, primary_key=True)
+    image_url = db.Column(db.String(300), nullable=False)
+    caption = db.Column(db.Text, nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Denormalized counters, maintained by the Like/Comment insert and delete hooks below
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    # Back the feed orderings: newest (created_at DESC, id DESC) and most_liked (like_count DESC, id DESC)
+    __table_args__ = (
+        db.Index('ix_community_post_created_at_id', 'created_at', 'id'),
+        db.Index('ix_community_post_like_count_id', 'like_count', 'id'),
+    )
+
+    likes = db.relationship('Like', backref='post', lazy='dynamic', cascade="all, delete-orphan")
+    comments = db.relationship('Comment', backref='post', lazy='dynamic', cascade="all, delete-orphan")
+
+    def to_dict(self, include_comments=False, include_likes_count=False, comments=None):
+        # comments may be passed in when already loaded in bulk (see serialize_posts)
+        data = {
+            "id": self.id,
+            "image_url": self.image_url,
+            "variants": variant_urls(uploaded_filename(self.image_url)),
+            "caption": self.caption,
+            "user_id": self.user_id,
+            "author_username": self.poster.username if self.poster.username else self.poster.email,
+            "created_at": self.created_at.isoformat() + 'Z',
+            "comments_count": self.comment_count
+        }
+        if include_likes_count:
+            data["likes_count"] = self.like_count
+        if include_comments:
+            if comments is None:
+                comments = self.comments.order_by(Comment.created_at.asc()).all()
+            data["comments"] = [comment.to_dict() for comment in comments]
+        return data
+
+    @staticmethod
+    def serialize_posts(posts):
+        """to_dict(include_likes_count=True, include_comments=True) for many posts at once.
+
+        Comments (with their authors) are loaded with one set-based query for
+        the whole list instead of per post. Posts should be loaded with their
+        poster eagerly (joinedload) to keep the total constant.
+        """
+        post_ids = [post.id for post in posts]
+        if not post_ids:
+            return []
+
+        comments_by_post = {post_id: [] for post_id in post_ids}
+        comments = (
+            Comment.query.options(joinedload(Comment.commenter))
+            .filter(Comment.post_id.in_(post_ids))
+            .order_by(Comment.created_at.asc(), Comment.id.asc())
+            .all()
+        )
+        for comment in comments:
+            comments_by_post[comment.post_id].append(comment)
+
+        return [
+            post.to_dict(include_comments=True, include_likes_count=True, comments=comments_by_post[post.id])
+            for post in posts
+        ]
+
+class Like(db.Model):
+    __tablename__ = "like"
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    post_id = db.Column(db.Integer, db.ForeignKey('community_post.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # The unique constraint's index leads with user_id, so lookups by post need their own
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'post_id', name='_user_post_uc'),
+        db.Index('ix_like_post_id', 'post_id'),
+    )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "post_id": self.post_id,
+            "created_at": self.created_at.isoformat() + 'Z'
+        }
+
+class Comment(db.Model):
+    __tablename__ = "comment"
+    id = db.Column(db.Integer, primary_key=True)
+    text = db.Column(db.Text, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    post_id = db.Column(db.Integer, db.ForeignKey('community_post.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Comments are always fetched per post, oldest first
+    __table_args__ = (db.Index('ix_comment_post_id_created_at', 'post_id', 'created_at'),)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "text": self.text,
+            "user_id": self.user_id,
+            "author_username": self.commenter.username if self.commenter.username else self.commenter.email,
+            "post_id": self.post_id,
+            "created_at": self.created_at.isoformat() + 'Z'
+        }
+
+
+def _bump_post_counter(connection, column, post_id, delta):
+    # Runs inside the flush, so the counter changes in the same transaction as the row itself
+    connection.execute(
+        CommunityPost.__table__.update()
+        .where(CommunityPost.__table__.c.id == post_id)
+        .values({column: CommunityPost.__table__.c[column] + delta})
+    )
+
+
+@event.listens_for(Like, "after_insert")
+def _like_inserted(mapper, connection, like):
+    _bump_post_counter(connection, "like_count", like.post_id, 1)
+
+
+@event.listens_for(Like, "after_delete")
+def _like_deleted(mapper, connection, like):
+    _bump_post_counter(connection, "like_count", like.post_id, -1)
+
+
+@event.listens_for(Comment, "after_insert")
+def _comment_inserted(mapper, connection, comment):
+    _bump_post_counter(connection, "comment_count", comment.post_id, 1)
+
+
+@event.listens_for(Comment, "after_delete")
+def _comment_deleted(mapper, connection, comment):
+    _bump_post_counter(connection, "comment_count", comment.post_id, -1)
+
+
+def reconcile_post_counts():
+    """Recompute every post's like/comment counters from the like and comment tables."""
+    posts = CommunityPost.__table__
+    like_totals = (
+        db.select(func.count(Like.id)).where(Like.post_id == posts.c.id).scalar_subquery()
+    )
+    comment_totals = (
+        db.select(func.count(Comment.id)).where(Comment.post_id == posts.c.id).scalar_subquery()
+    )
+    result = db.session.execute(
+        posts.update()
+        .where(or_(posts.c.like_count != like_totals, posts.c.comment_count != comment_totals))
+        .values(like_count=like_totals, comment_count=comment_totals)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+@login_manager.user_loader
+def load_user(user_id):
+    try:
+        user = User.query.get(int(user_id))
+        return user
+    except (ValueError, TypeError):
+        return None
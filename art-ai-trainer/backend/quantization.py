@@ -0,0 +1,105 @@
+"""Dynamic int8 quantization of the pipeline's Linear layers, for CPU hosts short on memory.
+
+Enabled with DIFFUSION_QUANTIZATION=int8. The Linear layers of the UNet
+(attention and feed-forward blocks) and of the CLIP text encoder then keep
+int8 weights and quantize their activations on the fly; convolutions and
+the VAE stay float32. The quantized state dicts are saved under
+QUANTIZED_WEIGHTS_DIR (default: quantized_weights) so later startups load
+them instead of quantizing again.
+"""
+import os
+import re
+
+
+QUANTIZATION_MODES = ("none", "int8")
+
+# Pipeline components whose Linear layers are quantized
+QUANTIZED_COMPONENTS = ("unet", "text_encoder")
+
+
+def _swap_linear_layers(module):
+    # Replace each nn.Linear with an empty dynamic int8 Linear of the same shape,
+    # so a cached quantized state dict can be loaded without quantizing again
+    import torch
+    from torch.ao.nn.quantized.dynamic import Linear as DynamicLinear
+
+    for name, child in module.named_children():
+        if type(child) is torch.nn.Linear:
+            setattr(module, name, DynamicLinear(child.in_features, child.out_features,
+                                                bias_=child.bias is not None, dtype=torch.qint8))
+        else:
+            _swap_linear_layers(child)
+
+
+class Quantization:
+    """Quantizes pipeline components in place, reusing cached weights from `cache_dir`."""
+
+    def __init__(self, mode="none", cache_dir="quantized_weights"):
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"DIFFUSION_QUANTIZATION must be one of {QUANTIZATION_MODES}")
+        self.mode = mode
+        self.cache_dir = cache_dir
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            mode=os.environ.get("DIFFUSION_QUANTIZATION", "none"),
+            cache_dir=os.environ.get("QUANTIZED_WEIGHTS_DIR", "quantized_weights"),
+        )
+
+    @property
+    def enabled(self):
+        return self.mode != "none"
+
+    def weights_id(self, model_id):
+        """Identifies the weights images are generated with, for cache keys."""
+        return f"{model_id}+{self.mode}" if self.enabled else model_id
+
+    def cache_path(self, model_id, component):
+        import torch
+
+        # Packed int8 weights are specific to the torch version and its quantized kernel backend
+        model_name = re.sub(r"[^\w.-]", "_", model_id)
+        engine = torch.backends.quantized.engine
+        return os.path.join(self.cache_dir, f"{model_name}-{component}-{self.mode}-{torch.__version__}-{engine}.pt")
+
+    def apply(self, pipeline, model_id):
+        """Quantize a CPU float32 pipeline in place. Does nothing unless enabled."""
+        if not self.enabled:
+            return pipeline
+        for component in QUANTIZED_COMPONENTS:
+            self._quantize(getattr(pipeline, component), model_id, component)
+        return pipeline
+
+    def _quantize(self, module, model_id, component):
+        # In place: a quantized copy would briefly hold both sets of weights
+        import torch
+
+        path = self.cache_path(model_id, component)
+        state_dict = None
+        if os.path.exists(path):
+            try:
+                # Our own file; packed int8 weights can't be loaded with weights_only
+                state_dict = torch.load(path, map_location="cpu", weights_only=False)
+            except Exception as e:
+                print(f"Could not read cached int8 {component} weights from {path}, quantizing again: {e}")
+
+        if state_dict is not None:
+            _swap_linear_layers(module)
+            try:
+                module.load_state_dict(state_dict)
+            except RuntimeError as e:
+                raise RuntimeError(f"Cached int8 {component} weights don't match the model; delete {path}: {e}")
+            print(f"Loaded int8 {component} weights from {path}")
+            return module.eval()
+
+        quantized = torch.ao.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            torch.save(quantized.state_dict(), tmp_path)
+            os.replace(tmp_path, path)
+            print(f"Saved int8 {component} weights to {path}")
+        except OSError as e:
+            print(f"Could not cache int8 {component} weights: {e}")
+        return quantized.eval()
@@ -0,0 +1,113 @@
+import collections
+import hashlib
+import json
+import os
+import re
+import threading
+
+
+# Settings that fully determine a generated image (together with the model id)
+CACHE_KEY_FIELDS = ("prompt", "negative_prompt", "seed", "scheduler", "num_inference_steps", "guidance_scale", "width", "height")
+
+CACHED_FILENAME_PREFIX = "generated_ref_"
+CACHED_FILENAME_RE = re.compile(r"^generated_ref_[0-9a-f]{64}\.png$")
+
+
+def normalize_prompt(text):
+    # CLIP's tokenizer lowercases and collapses whitespace itself, so these spellings encode identically
+    return " ".join((text or "").split()).lower()
+
+
+def cache_key(params, model_id):
+    key_data = {name: params.get(name) for name in CACHE_KEY_FIELDS}
+    key_data["prompt"] = normalize_prompt(key_data["prompt"])
+    key_data["negative_prompt"] = normalize_prompt(key_data["negative_prompt"])
+    key_data["model_id"] = model_id
+    encoded = json.dumps(key_data, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class ResultCache:
+    """Content-addressed store of generated PNGs in the uploads folder.
+
+    Each result is saved as generated_ref_<key>.png, where the key hashes every
+    setting that determines the image. Files are evicted least recently used
+    first once their total size exceeds `max_bytes`. Only files following the
+    cache naming scheme are ever touched. `on_evict(filename)` is called after
+    a file is evicted, to clean up anything derived from it.
+    """
+
+    def __init__(self, folder, max_bytes, on_evict=None):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict() # filename -> size, least recently used first
+        self._total_bytes = 0
+        self._loaded = False
+
+    def _path(self, filename):
+        return os.path.join(self.folder, filename)
+
+    def _load_index(self):
+        # Rebuild the LRU order from file modification times, which lookups refresh on every hit
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.isdir(self.folder):
+            return
+        found = []
+        for entry in os.scandir(self.folder):
+            if CACHED_FILENAME_RE.match(entry.name) and entry.is_file():
+                stat = entry.stat()
+                found.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, filename, size in sorted(found):
+            self._entries[filename] = size
+            self._total_bytes += size
+
+    def lookup(self, key):
+        filename = f"{CACHED_FILENAME_PREFIX}{key}.png"
+        with self._lock:
+            self._load_index()
+            if filename not in self._entries:
+                return None
+            if not os.path.exists(self._path(filename)):
+                # Removed behind our back; forget it
+                self._total_bytes -= self._entries.pop(filename)
+                return None
+            self._entries.move_to_end(filename)
+            try:
+                os.utime(self._path(filename))
+            except OSError:
+                pass
+            return filename
+
+    def store(self, key, image):
+        filename = f"{CACHED_FILENAME_PREFIX}{key}.png"
+        path = self._path(filename)
+        # Write to a temporary name first so readers never see a half-written PNG
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        image.save(tmp_path, format="PNG")
+        os.replace(tmp_path, path)
+        size = os.path.getsize(path)
+
+        with self._lock:
+            self._load_index()
+            self._total_bytes -= self._entries.pop(filename, 0)
+            self._entries[filename] = size
+            self._total_bytes += size
+            self._evict()
+        return filename
+
+    def _evict(self):
+        # Never evict the entry just stored, even if it alone exceeds the budget
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            filename, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self._path(filename))
+                print(f"Evicted cached generated image {filename}")
+            except FileNotFoundError:
+                pass
+            if self.on_evict:
+                self.on_evict(filename)
@@ -0,0 +1,49 @@
+"""Where uploaded and generated images live on disk, and their public URLs."""
+from flask import current_app
+
+from blob_store import BlobStore
+from image_variants import VariantGenerator
+
+
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+
+
+def init_app(app):
+    # Drawing images and uploaded files live on disk under content-hash names; the database keeps only the name
+    app.extensions["blob_store"] = BlobStore(app.config['UPLOAD_FOLDER'])
+    # Small WebP copies of uploaded images for the grids and feed, written in the background
+    app.extensions["image_variants"] = VariantGenerator(
+        app.config['UPLOAD_FOLDER'], workers=app.config['IMAGE_VARIANT_WORKERS']
+    )
+
+
+def blob_store():
+    return current_app.extensions["blob_store"]
+
+
+def image_variants():
+    return current_app.extensions["image_variants"]
+
+
+def allowed_file(filename):
+    return '.' in filename and \
+           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def upload_url(filename):
+    return f"{current_app.config['PUBLIC_BASE_URL']}/{current_app.config['UPLOAD_FOLDER']}/{filename}"
+
+
+def uploaded_filename(url):
+    # Public upload URL -> filename in UPLOAD_FOLDER, or None for anything else (data URLs, other hosts)
+    prefix = upload_url("")
+    if url and url.startswith(prefix) and "/" not in url[len(prefix):]:
+        return url[len(prefix):]
+    return None
+
+
+def variant_urls(filename):
+    # Only variants already written are listed; the original image_url is always the fallback
+    if not filename:
+        return {}
+    return {str(width): upload_url(path) for width, path in image_variants().existing_variants(filename).items()}
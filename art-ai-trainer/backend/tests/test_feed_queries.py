@@ -0,0 +1,104 @@
+import os
+
+import pytest
+from sqlalchemy import event
+
+from app import create_app
+from extensions import db
+from models import User, CommunityPost, Like, Comment
+
+
+# In-memory SQLite by default. Point TEST_DATABASE_URL at a scratch Postgres database to run
+# against it too (every table in it is dropped); see the README.
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL", "sqlite://")
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": TEST_DATABASE_URL,
+        "UPLOAD_FOLDER": str(tmp_path / "uploads"),
+        "MEDIA_ROOT": str(tmp_path),
+    })
+    with app.app_context():
+        # A scratch server database may still hold tables from an interrupted run
+        db.drop_all()
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def seed_posts(count):
+    # Authors with and without a username, every post liked and commented on by several users
+    users = [User(email=f"user{i}@example.com", password="x", username=f"user{i}" if i % 2 else None)
+             for i in range(User.query.count(), User.query.count() + 3)]
+    db.session.add_all(users)
+    for i in range(count):
+        post = CommunityPost(image_url=f"/static/uploads/post{i}.png", caption=f"Post {i}", poster=users[i % 3])
+        db.session.add(post)
+        for user in users[:1 + i % 3]:
+            db.session.add(Like(liker=user, post=post))
+        for user in users[:2]:
+            db.session.add(Comment(text=f"Nice {i}", commenter=user, post=post))
+    db.session.commit()
+    # Start each request with an empty identity map, as a real request would
+    db.session.remove()
+
+
+def get_feed_page(client, sort_by, limit, cursor=None):
+    """GET one feed page; returns (number of SQL statements it ran, response JSON)."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    url = f"/api/get_community_posts?sort_by={sort_by}&limit={limit}"
+    if cursor:
+        url += f"&cursor={cursor}"
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+    assert response.status_code == 200
+    page = response.get_json()
+    assert all(len(post["comments"]) == 2 and post["likes_count"] >= 1 for post in page["posts"])
+    return len(statements), page
+
+
+@pytest.mark.parametrize("sort_by", ["newest", "most_liked"])
+def test_feed_page_query_count_does_not_grow_with_page_size(app, sort_by):
+    client = app.test_client()
+
+    seed_posts(5)
+    small_page, page = get_feed_page(client, sort_by, 5)
+    assert len(page["posts"]) == 5
+    seed_posts(45)
+    large_page, page = get_feed_page(client, sort_by, 50)
+    assert len(page["posts"]) == 50
+
+    # One query for the posts (with their authors), one for all of their comments (with theirs)
+    assert small_page == large_page == 2
+
+
+@pytest.mark.parametrize("sort_by", ["newest", "most_liked"])
+def test_feed_cursor_pages_cover_every_post_once(app, sort_by):
+    # Exercises the keyset filter: a row comparison on Postgres, an OR of comparisons elsewhere
+    client = app.test_client()
+    seed_posts(23)
+    sort_field = "created_at" if sort_by == "newest" else "likes_count"
+
+    seen, cursor = [], None
+    while True:
+        statements, page = get_feed_page(client, sort_by, 5, cursor)
+        assert statements == 2
+        seen += [(post[sort_field], post["id"]) for post in page["posts"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    assert len(seen) == 23
+    assert seen == sorted(seen, reverse=True)
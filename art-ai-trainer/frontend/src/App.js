@@ -98,13 +98,14 @@ const App = () => {
 
   const handleAddToMyDrawings = async (drawingData) => {
     console.log("handleAddToMyDrawings called with data:", drawingData.name); // ADD THIS LINE
+    // Sent as multipart form data; the server streams the PNG to disk
+    const formData = new FormData();
+    formData.append('file', drawingData.image, `${drawingData.name || 'drawing'}.png`);
+    formData.append('name', drawingData.name);
     try {
       const response = await axios.post(
-        `${API_BASE_URL}/upload-drawing`,
-        {
-          name: drawingData.name,
-          image_url: drawingData.image_url,
-        },
+        `${API_BASE_URL}/upload-drawing-file`,
+        formData,
         {
           withCredentials: true,
         }
@@ -254,16 +254,19 @@ const Drawing = ({ skill: initialSkill, onBack, aiGeneratedImageURL, selectedExi
       console.log("Canvas reference not found."); // ADD THIS LINE
       return;
     }
-    const drawingData = {
-      name: drawingName,
-      image_url: canvas.toDataURL('image/png'),
-    };
-    if (onAddToMyDrawings) {
-      console.log("Calling onAddToMyDrawings prop..."); // ADD THIS LINE
-      onAddToMyDrawings(drawingData);
-    } else {
+    if (!onAddToMyDrawings) {
       console.log("onAddToMyDrawings prop is not defined."); // ADD THIS LINE
+      return;
     }
+    // A PNG blob is uploaded as a file, without the base64 data URL's extra size and copies
+    canvas.toBlob((image) => {
+      if (!image) {
+        console.error("Could not export the canvas as an image.");
+        return;
+      }
+      console.log("Calling onAddToMyDrawings prop..."); // ADD THIS LINE
+      onAddToMyDrawings({ name: drawingName, image });
+    }, 'image/png');
   };
 
   return (
@@ -1,9 +1,8 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import './Home.css';
 import { useUser } from './UserContext';
-
-const API_BASE_URL = 'https://localhost:5001';
+import { generateReferenceImage, generationStatusText, randomSeed, QUALITY_OPTIONS } from './generationApi';
 
 const Home = ({ onStartDrawing, onGoToMyDrawings, onGoToReference, onGoToArtPost, onAICreateDrawing, onStartBlankDrawing }) => { // ADDED onStartBlankDrawing prop
   const [skill, setSkill] = useState('');
@@ -15,12 +14,24 @@ const Home = ({ onStartDrawing, onGoToMyDrawings, onGoToReference, onGoToArtPost
   const [showAIGeneratorModal, setShowAIGeneratorModal] = useState(false);
   const [aiPrompt, setAiPrompt] = useState('');
   const [aiNegativePrompt, setAiNegativePrompt] = useState('');
+  const [aiQuality, setAiQuality] = useState('standard');
+  const [aiNewVariation, setAiNewVariation] = useState(false); // Ask for a different image than the cached one
+  const [aiGeneratedSeed, setAiGeneratedSeed] = useState(null); // Seed of the last generated image
   const [isGeneratingAI, setIsGeneratingAI] = useState(false);
   const [aiGeneratorMessage, setAiGeneratorMessage] = useState('');
+  const [aiGenerationProgress, setAiGenerationProgress] = useState(null); // { step, total_steps } while generating
+  const [aiGenerationPreview, setAiGenerationPreview] = useState(''); // Low-resolution preview of the image in progress
+  const [aiGenerationQueue, setAiGenerationQueue] = useState(null); // { queue_position, estimated_wait_seconds } while waiting
+  const generationAbortRef = useRef(null); // AbortController of the generation in progress
   const [aiGeneratedImageUrl, setAiGeneratedImageUrl] = useState(null);
 
   const [showAIPreviewModal, setShowAIPreviewModal] = useState(false);
 
+  // Cancel a generation still in progress when the user navigates away
+  useEffect(() => () => {
+    if (generationAbortRef.current) generationAbortRef.current.abort();
+  }, []);
+
 
   // Image map with arrays of images (BlankCanvas removed as it's now a button)
   const imageMap = {
@@ -84,16 +95,6 @@ const Home = ({ onStartDrawing, onGoToMyDrawings, onGoToReference, onGoToArtPost
 
   const referenceImage = skill ? imageMap[skill]?.[currentImageIndex] : null;
 
-
-  // Helper function to handle fetch responses
-  const handleFetchResponse = async (res) => {
-    if (!res.ok) {
-      const errorData = await res.json().catch(() => ({ error: res.statusText }));
-      throw new Error(errorData.error || res.statusText);
-    }
-    return res.json();
-  };
-
   const handleSkillChange = (selectedSkill) => {
     setSkill(selectedSkill);
     setCurrentImageIndex(0);
@@ -136,29 +137,40 @@ const Home = ({ onStartDrawing, onGoToMyDrawings, onGoToReference, onGoToArtPost
     setAiGeneratorMessage("Generating your AI image... This may take a moment.");
     setAiGeneratedImageUrl(null);
 
+    // Aborted on unmount so the server stops generating an image nobody will see
+    generationAbortRef.current = new AbortController();
     try {
-      const response = await fetch(`${API_BASE_URL}/api/generate_reference_image`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ prompt: aiPrompt, negative_prompt: aiNegativePrompt }),
-        credentials: 'include',
+      const job = await generateReferenceImage({
+        prompt: aiPrompt,
+        negativePrompt: aiNegativePrompt,
+        quality: aiQuality,
+        seed: aiNewVariation ? randomSeed() : undefined,
+        signal: generationAbortRef.current.signal,
+        onProgress: (update) => {
+          setAiGenerationQueue(update.queue_position ? update : null);
+          if (update.progress) setAiGenerationProgress(update.progress);
+          if (update.preview) setAiGenerationPreview(update.preview);
+        },
       });
-
-      const data = await handleFetchResponse(response);
-      const newGeneratedImageUrl = data.image_url;
+      const newGeneratedImageUrl = job.image_url;
 
       setAiGeneratedImageUrl(newGeneratedImageUrl);
+      setAiGeneratedSeed(job.seed);
       setShowAIGeneratorModal(false);
       setShowAIPreviewModal(true);
 
       setAiGeneratorMessage('');
 
     } catch (error) {
+      if (error.name === 'AbortError') return; // the component is gone
       console.error("Error generating AI image:", error);
       setAiGeneratorMessage(`Failed to generate image: ${error.message}. Please try again.`);
       setAiGeneratedImageUrl(null);
     } finally {
       setIsGeneratingAI(false);
+      setAiGenerationProgress(null);
+      setAiGenerationPreview('');
+      setAiGenerationQueue(null);
     }
   };
 
@@ -325,6 +337,25 @@ const Home = ({ onStartDrawing, onGoToMyDrawings, onGoToReference, onGoToArtPost
                 disabled={isGeneratingAI}
                 className="negative-prompt-input"
               />
+              <select
+                value={aiQuality}
+                onChange={(e) => setAiQuality(e.target.value)}
+                disabled={isGeneratingAI}
+                className="quality-select"
+              >
+                {QUALITY_OPTIONS.map((option) => (
+                  <option key={option.value} value={option.value}>{option.label}</option>
+                ))}
+              </select>
+              <label className="variation-checkbox">
+                <input
+                  type="checkbox"
+                  checked={aiNewVariation}
+                  onChange={(e) => setAiNewVariation(e.target.checked)}
+                  disabled={isGeneratingAI}
+                />
+                New variation (a different image for the same prompt)
+              </label>
             </div>
 
             {aiGeneratorMessage && <div className={`generator-message ${aiGeneratorMessage.includes('Error') ? 'error' : ''}`}>{aiGeneratorMessage}</div>}
@@ -344,8 +375,14 @@ const Home = ({ onStartDrawing, onGoToMyDrawings, onGoToReference, onGoToArtPost
             
             {isGeneratingAI && (
                 <div className="loading-spinner-container">
-                    <div className="loading-spinner"></div>
-                    <p>Generating...</p>
+                    {aiGenerationPreview ? (
+                      <img src={aiGenerationPreview} alt="Generation in progress" className="generation-preview-image" />
+                    ) : (
+                      <div className="loading-spinner"></div>
+                    )}
+                    <p>
+                      {generationStatusText(aiGenerationProgress, aiGenerationQueue)}
+                    </p>
                 </div>
             )}
           </div>
@@ -362,6 +399,7 @@ const Home = ({ onStartDrawing, onGoToMyDrawings, onGoToReference, onGoToArtPost
             <div className="preview-image-container">
               <img src={aiGeneratedImageUrl} alt="Generated AI Reference" className="preview-image" />
             </div>
+            {aiGeneratedSeed !== null && <p className="generated-seed">Seed: {aiGeneratedSeed}</p>}
 
             <div className="modal-actions">
               <button
@@ -1,5 +1,6 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import './Reference.css';
+import { generateReferenceImage, generationStatusText, randomSeed, QUALITY_OPTIONS } from './generationApi';
 
 const API_BASE_URL = 'https://localhost:5001'; // Ensure this matches your Flask backend's address
 
@@ -102,20 +103,23 @@ const Reference = ({ goBackHome }) => {
   const [showGenerator, setShowGenerator] = useState(false);
   const [prompt, setPrompt] = useState('');
   const [negativePrompt, setNegativePrompt] = useState('');
+  const [quality, setQuality] = useState('standard');
+  const [newVariation, setNewVariation] = useState(false); // Ask for a different image than the cached one
+  const [generatedSeed, setGeneratedSeed] = useState(null); // Seed of the last generated image
   const [generatedImageUrl, setGeneratedImageUrl] = useState('');
   const [isGenerating, setIsGenerating] = useState(false);
   const [generatorMessage, setGeneratorMessage] = useState('');
+  const [generationProgress, setGenerationProgress] = useState(null); // { step, total_steps } while generating
+  const [generationPreview, setGenerationPreview] = useState(''); // Low-resolution preview of the image in progress
+  const [generationQueue, setGenerationQueue] = useState(null); // { queue_position, estimated_wait_seconds } while waiting
+  const generationAbortRef = useRef(null); // AbortController of the generation in progress
+
+  // Cancel a generation still in progress when the user navigates away
+  useEffect(() => () => {
+    if (generationAbortRef.current) generationAbortRef.current.abort();
+  }, []);
   const [currentUserId, setCurrentUserId] = useState(null); // To check if user is logged in
 
-  // Helper function to handle fetch responses
-  const handleFetchResponse = async (res) => {
-    if (!res.ok) {
-      const errorData = await res.json().catch(() => ({ error: res.statusText }));
-      throw new Error(errorData.error || res.statusText);
-    }
-    return res.json();
-  };
-
   // Fetch current user ID on component mount (to enable/disable generator)
   useEffect(() => {
     const fetchWhoAmI = async () => {
@@ -218,25 +222,36 @@ const Reference = ({ goBackHome }) => {
     setGeneratorMessage("Generating your AI reference image... This may take a moment.");
     setGeneratedImageUrl(''); // Clear previous image
 
+    // Aborted on unmount so the server stops generating an image nobody will see
+    generationAbortRef.current = new AbortController();
     try {
-      const response = await fetch(`${API_BASE_URL}/api/generate_reference_image`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ prompt, negative_prompt: negativePrompt }),
-        credentials: 'include',
+      const job = await generateReferenceImage({
+        prompt,
+        negativePrompt,
+        quality,
+        seed: newVariation ? randomSeed() : undefined,
+        signal: generationAbortRef.current.signal,
+        onProgress: (update) => {
+          setGenerationQueue(update.queue_position ? update : null);
+          if (update.progress) setGenerationProgress(update.progress);
+          if (update.preview) setGenerationPreview(update.preview);
+        },
       });
-
-      const data = await handleFetchResponse(response);
-      setGeneratedImageUrl(data.image_url);
+      setGeneratedImageUrl(job.image_url);
+      setGeneratedSeed(job.seed);
       setGeneratorMessage("Image generated successfully!");
       setPrompt(''); // Clear prompt after generation
       setNegativePrompt(''); // Clear negative prompt
     } catch (error) {
+      if (error.name === 'AbortError') return; // the component is gone
       console.error("Error generating image:", error);
       setGeneratorMessage(`Failed to generate image: ${error.message}. Please try again.`);
       setGeneratedImageUrl('');
     } finally {
       setIsGenerating(false);
+      setGenerationProgress(null);
+      setGenerationPreview('');
+      setGenerationQueue(null);
     }
   };
 
@@ -346,6 +361,25 @@ const Reference = ({ goBackHome }) => {
               disabled={isGenerating || !currentUserId}
               className="negative-prompt-input"
             />
+            <select
+              value={quality}
+              onChange={(e) => setQuality(e.target.value)}
+              disabled={isGenerating || !currentUserId}
+              className="quality-select"
+            >
+              {QUALITY_OPTIONS.map((option) => (
+                <option key={option.value} value={option.value}>{option.label}</option>
+              ))}
+            </select>
+            <label className="variation-checkbox">
+              <input
+                type="checkbox"
+                checked={newVariation}
+                onChange={(e) => setNewVariation(e.target.checked)}
+                disabled={isGenerating || !currentUserId}
+              />
+              New variation (a different image for the same prompt)
+            </label>
             <button onClick={handleGenerateImage} disabled={isGenerating || !currentUserId || !prompt.trim()} className="generate-btn">
               {isGenerating ? 'Generating...' : 'Generate Image'}
             </button>
@@ -355,8 +389,14 @@ const Reference = ({ goBackHome }) => {
 
           {isGenerating && (
             <div className="loading-spinner-container">
-                <div className="loading-spinner"></div>
-                <p>Generating...</p>
+                {generationPreview ? (
+                  <img src={generationPreview} alt="Generation in progress" className="generation-preview-image" />
+                ) : (
+                  <div className="loading-spinner"></div>
+                )}
+                <p>
+                  {generationStatusText(generationProgress, generationQueue)}
+                </p>
             </div>
           )}
 
@@ -364,6 +404,7 @@ const Reference = ({ goBackHome }) => {
             <div className="generated-image-display">
               <h3>Your AI Generated Reference:</h3>
               <img src={generatedImageUrl} alt="AI Generated Reference" className="generated-preview-image" />
+              {generatedSeed !== null && <p className="generated-seed">Seed: {generatedSeed}</p>}
               <div className="download-buttons">
                 <a
                   href={`<span class="math-inline">\{API\_BASE\_URL\}/download/uploads/</span>{generatedImageUrl.split('/').pop()}`} // Ensure correct download URL for AI images
@@ -1,5 +1,6 @@
 import React, { useState, useEffect, useCallback } from 'react';
 import './artPost.css';
+import { variantSrcSet } from './imageVariants';
 
 const API_BASE_URL = 'https://localhost:5001'; // Ensure this matches your Flask backend's address
 
@@ -18,6 +19,8 @@ const ArtPost = ({ goBackHome }) => {
   const [isUploading, setIsUploading] = useState(false);
 
   const [sortBy, setSortBy] = useState('newest');
+  const [nextCursor, setNextCursor] = useState(null); // Cursor for the next feed page, null when there are no more
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
 
   // State for search query
   const [searchQuery, setSearchQuery] = useState('');
@@ -50,19 +53,39 @@ const ArtPost = ({ goBackHome }) => {
     fetchWhoAmI();
   }, []);
 
-  // Fetch all community posts
+  // Fetch the first page of community posts; later pages are appended by loadMorePosts
   // eslint-disable-next-line react-hooks/exhaustive-deps
   const fetchCommunityPosts = useCallback(() => { // ESLint warning ignored here as sortBy is a valid dependency
     // Note: Search filtering is done client-side for now
     fetch(`${API_BASE_URL}/api/get_community_posts?sort_by=${sortBy}`, { credentials: 'include' })
       .then(handleFetchResponse)
-      .then(data => setCommunityPosts(data))
+      .then(data => {
+        setCommunityPosts(data.posts);
+        setNextCursor(data.next_cursor);
+      })
       .catch(err => {
         console.error("Error fetching community posts:", err);
         setMessage(`Failed to load community posts: ${err.message}`);
       });
   }, [sortBy]); // sortBy is a necessary dependency here
 
+  // Fetch the next page of the feed after the last post we have
+  const loadMorePosts = () => {
+    if (!nextCursor || isLoadingMore) return;
+    setIsLoadingMore(true);
+    fetch(`${API_BASE_URL}/api/get_community_posts?sort_by=${sortBy}&cursor=${encodeURIComponent(nextCursor)}`, { credentials: 'include' })
+      .then(handleFetchResponse)
+      .then(data => {
+        setCommunityPosts(prevPosts => [...prevPosts, ...data.posts]);
+        setNextCursor(data.next_cursor);
+      })
+      .catch(err => {
+        console.error("Error fetching more community posts:", err);
+        setMessage(`Failed to load more posts: ${err.message}`);
+      })
+      .finally(() => setIsLoadingMore(false));
+  };
+
 
   // Fetch user's drawings
   const fetchMyDrawings = useCallback(() => {
@@ -189,13 +212,18 @@ const ArtPost = ({ goBackHome }) => {
         body: JSON.stringify(postData),
         credentials: 'include',
       });
-      await handleFetchResponse(res);
+      const newPost = await handleFetchResponse(res);
       setShowModal(false);
       setNewPostCaption('');
       setUploadedFile(null);
       setUploadedFilePreview('');
       setSelectedExistingDrawing(null);
-      fetchCommunityPosts();
+      if (sortBy === 'newest') {
+        // The new post belongs at the top of the feed; no need to reload it
+        setCommunityPosts(prevPosts => [newPost, ...prevPosts]);
+      } else {
+        fetchCommunityPosts();
+      }
     } catch (err) {
       console.error('Post failed:', err);
     }
@@ -238,8 +266,12 @@ const ArtPost = ({ goBackHome }) => {
       credentials: 'include',
     })
       .then(handleFetchResponse)
-      .then(data => {
-        fetchCommunityPosts();
+      .then(newComment => {
+        setCommunityPosts(prevPosts =>
+          prevPosts.map(post =>
+            post.id === postId ? { ...post, comments: [...(post.comments || []), newComment] } : post
+          )
+        );
         setMessage('Comment added!');
       })
       .catch(err => {
@@ -260,7 +292,7 @@ const ArtPost = ({ goBackHome }) => {
                 credentials: 'include',
             });
             await handleFetchResponse(res);
-            fetchCommunityPosts();
+            setCommunityPosts(prevPosts => prevPosts.filter(post => post.id !== postId));
         } catch (err) {
             console.error("Error deleting post:", err);
             setMessage(`Failed to delete post: ${err.message}`);
@@ -330,7 +362,13 @@ const ArtPost = ({ goBackHome }) => {
                           className={`drawing-item ${selectedExistingDrawing && selectedExistingDrawing.id === drawing.id ? 'selected' : ''}`}
                           onClick={() => handleSelectExistingDrawing(drawing)}
                         >
-                          <img src={drawing.image_url} alt={drawing.name} className="drawing-thumb" />
+                          <img
+                            src={drawing.image_url}
+                            srcSet={variantSrcSet(drawing.variants)}
+                            sizes="120px"
+                            alt={drawing.name}
+                            className="drawing-thumb"
+                          />
                           <p className="drawing-name">{drawing.name}</p>
                         </div>
                       ))}
@@ -413,7 +451,14 @@ const ArtPost = ({ goBackHome }) => {
         {filteredPosts.length > 0 ? (
           filteredPosts.map((post) => (
             <div key={post.id} className="community-post-card">
-              <img src={post.image_url} alt={post.caption} className="post-image" />
+              <img
+                src={post.image_url}
+                srcSet={variantSrcSet(post.variants)}
+                sizes="(max-width: 600px) 100vw, 400px"
+                loading="lazy"
+                alt={post.caption}
+                className="post-image"
+              />
               <p className="post-caption">{post.caption}</p>
               <p className="post-author">By: {post.author_username || 'Anonymous'}</p>
 
@@ -460,6 +505,14 @@ const ArtPost = ({ goBackHome }) => {
           <p>No posts found matching your search or filters.</p>
         )}
       </div>
+
+      {nextCursor && (
+        <div className="load-more-container">
+          <button onClick={loadMorePosts} disabled={isLoadingMore} className="load-more-btn">
+            {isLoadingMore ? 'Loading...' : 'Load More'}
+          </button>
+        </div>
+      )}
     </div>
   );
 };
@@ -0,0 +1,106 @@
+const API_BASE_URL = 'https://localhost:5001';
+
+// How long each status request may block on the server before we ask again
+const JOB_POLL_WAIT_SECONDS = 20;
+
+const handleFetchResponse = async (res) => {
+  if (!res.ok) {
+    const errorData = await res.json().catch(() => ({ error: res.statusText }));
+    throw new Error(errorData.error || res.statusText);
+  }
+  return res.json();
+};
+
+// Quality tiers accepted by the server: faster drafts or slower, more detailed images
+export const QUALITY_OPTIONS = [
+  { value: 'draft', label: 'Draft (fastest)' },
+  { value: 'standard', label: 'Standard' },
+  { value: 'final', label: 'Final (most detail)' },
+];
+
+// The server always uses the same seed when none is given, so repeated prompts come back
+// instantly from its cache; a random seed asks for a new variation instead
+const MAX_SEED = 2 ** 32 - 1;
+export const randomSeed = () => Math.floor(Math.random() * (MAX_SEED + 1));
+
+// Text for a job in progress: its place in line while queued, then the denoising step
+export const generationStatusText = (progress, queue) => {
+  if (progress) return `Generating... step ${progress.step} of ${progress.total_steps}`;
+  if (queue) {
+    const wait = queue.estimated_wait_seconds ? `, about ${Math.ceil(queue.estimated_wait_seconds)} s` : '';
+    return `Waiting in line (#${queue.queue_position}${wait})...`;
+  }
+  return 'Generating...';
+};
+
+// Follows a job's Server-Sent Events, passing each progress update to onProgress.
+// Resolves with the finished job, or with null if the stream broke or was aborted so the caller can poll instead.
+const followJobEvents = (job, onProgress, signal) => new Promise((resolve) => {
+  const source = new EventSource(`${API_BASE_URL}${job.events_url}`, { withCredentials: true });
+  const stop = (result) => {
+    source.close();
+    if (signal) signal.removeEventListener('abort', onAbort);
+    resolve(result);
+  };
+  const onAbort = () => stop(null);
+  if (signal) signal.addEventListener('abort', onAbort);
+  source.addEventListener('progress', (event) => {
+    if (onProgress) onProgress(JSON.parse(event.data));
+  });
+  source.addEventListener('done', (event) => stop(JSON.parse(event.data)));
+  source.onerror = () => stop(null);
+});
+
+// Tells the server nobody is waiting for a job any more, so it stops at the next denoising step
+const cancelJob = (jobId) => fetch(`${API_BASE_URL}/api/generate_reference_image/${jobId}`, {
+  method: 'DELETE',
+  credentials: 'include',
+  keepalive: true, // lets the request outlive a page that is closing
+}).catch(() => {});
+
+// Submits a generation job and waits until it finishes, streaming progress (step counts and
+// a low-resolution preview) to onProgress when the browser supports it, else long-polling.
+// Resolves with the finished job, which carries the image_url and the seed used; rejects if the job fails.
+// Aborting `signal` (e.g. when the component unmounts) cancels the job on the server and rejects
+// with an AbortError.
+export const generateReferenceImage = async ({ prompt, negativePrompt, quality = 'standard', seed, onProgress, signal }) => {
+  const submitResponse = await fetch(`${API_BASE_URL}/api/generate_reference_image`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ prompt, negative_prompt: negativePrompt, quality, seed }),
+    credentials: 'include',
+    signal,
+  });
+  let job = await handleFetchResponse(submitResponse);
+  if (onProgress) onProgress(job);
+
+  const onAbort = () => cancelJob(job.job_id);
+  if (signal) signal.addEventListener('abort', onAbort);
+  try {
+    if (signal && signal.aborted) onAbort();
+
+    if (job.status !== 'succeeded' && job.status !== 'failed' && job.events_url && window.EventSource) {
+      const finishedJob = await followJobEvents(job, onProgress, signal);
+      if (finishedJob) {
+        job = { ...job, ...finishedJob };
+      }
+    }
+
+    while (job.status !== 'succeeded') {
+      if (signal && signal.aborted) {
+        throw new DOMException('Image generation was cancelled', 'AbortError');
+      }
+      if (job.status === 'failed' || job.status === 'cancelled') {
+        throw new Error(job.error || 'Image generation failed');
+      }
+      const statusResponse = await fetch(
+        `${API_BASE_URL}${job.status_url || `/api/generate_reference_image/${job.job_id}`}?wait=${JOB_POLL_WAIT_SECONDS}`,
+        { credentials: 'include', signal }
+      );
+      job = { ...job, ...(await handleFetchResponse(statusResponse)) };
+    }
+    return job;
+  } finally {
+    if (signal) signal.removeEventListener('abort', onAbort);
+  }
+};
@@ -0,0 +1,8 @@
+// Turns the server's { width: url } map of resized copies into an <img srcSet>, so the
+// browser downloads the smallest copy that fills the element instead of the full image.
+// Variants are written in the background, so a just-uploaded image may have none yet;
+// the plain src (the original) is used then.
+export const variantSrcSet = (variants) => {
+  const candidates = Object.entries(variants || {}).map(([width, url]) => `${url} ${width}w`);
+  return candidates.length > 0 ? candidates.join(', ') : undefined;
+};
@@ -2,6 +2,7 @@ import React, { useState, useEffect, useCallback } from 'react';
 import axios from 'axios';
 import { useNavigate } from 'react-router-dom';
 import './myDrawings.css';
+import { variantSrcSet } from './imageVariants';
 import { useUser } from './UserContext'; 
 
 const API_BASE_URL = 'https://localhost:5001';
@@ -64,24 +65,20 @@ const MyDrawings = ({ onSelectDrawing, onBack }) => {
     setLoading(true); 
 
     for (const file of files) {
-      const reader = new FileReader();
-      reader.onload = async (event) => {
-        const base64 = event.target.result;
-        try {
-          await axios.post(`${API_BASE_URL}/upload-drawing`, {
-            name: file.name,
-            image_url: base64
-          }, { withCredentials: true });
-          fetchDrawings(); // Re-fetch all drawings after successful upload
-        } catch (err) {
-          console.error('Upload failed:', err);
-          alert(`Failed to upload ${file.name}. Please ensure you are logged in.`);
-          if (err.response && err.response.status === 401) {
-            navigate('/login');
-          }
+      // Send the file itself as multipart form data; the server streams it to disk
+      const formData = new FormData();
+      formData.append('file', file);
+      formData.append('name', file.name);
+      try {
+        await axios.post(`${API_BASE_URL}/upload-drawing-file`, formData, { withCredentials: true });
+        fetchDrawings(); // Re-fetch all drawings after successful upload
+      } catch (err) {
+        console.error('Upload failed:', err);
+        alert(`Failed to upload ${file.name}. Please ensure you are logged in.`);
+        if (err.response && err.response.status === 401) {
+          navigate('/login');
         }
-      };
-      reader.readAsDataURL(file);
+      }
     }
   };
 
@@ -193,6 +190,9 @@ const MyDrawings = ({ onSelectDrawing, onBack }) => {
             <div key={drawing.id} className="drawing-card">
               <img
                 src={drawing.image_url}
+                srcSet={variantSrcSet(drawing.variants)}
+                sizes="(max-width: 600px) 50vw, 240px"
+                loading="lazy"
                 alt={drawing.name}
                 onClick={() => handleDrawingClick(drawing)}
               />